@@ -1,20 +1,30 @@
 import sqlite3
 import pandas as pd
 import chromadb
-from chromadb.utils import embedding_functions
 import openai
 import tiktoken
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared helpers live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_backends import DEFAULT_BACKEND, get_or_create_collection
+from lexical_index import build_fts_index
+from nutrition_filter import ensure_indexes, tag_recipe_ids
+from ingredient_parsing import build_recipe_ingredients
+
 load_dotenv()
 
 # ========================
 # STEP 3: EMBED RECIPES
 # ========================
 
-def embed_recipes():
-    """Embed recipes from recipes_clean.db using OpenAI and save to ChromaDB"""
+def embed_recipes(backend=DEFAULT_BACKEND, reembed=False):
+    """Embed recipes from recipes_clean.db with the chosen backend and save to ChromaDB.
+
+    reembed=True drops the backend's existing collection and embeds everything again.
+    """
     openai.api_key = os.getenv("OPENAI_API_KEY")
 
     conn = sqlite3.connect("recipes_clean.db")
@@ -37,13 +47,12 @@ def embed_recipes():
 
     # Embed
     client = chromadb.PersistentClient(path="chroma_db")
-    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-        api_key=openai.api_key,
-        model_name="text-embedding-ada-002"
-    )
-    collection = client.get_or_create_collection(
-        name="recipes_collection",
-        embedding_function=openai_ef
+    collection = get_or_create_collection(
+        client,
+        "recipes_collection",
+        backend,
+        openai.api_key,
+        reembed=reembed
     )
 
     batch_size = 50
@@ -53,14 +62,53 @@ def embed_recipes():
         documents = batch_df['combined_text'].tolist()
         ids = batch_df['id'].astype(str).tolist()
         metadata = batch_df[['name', 'url']].to_dict(orient='records')
+        # Numeric id so queries can be restricted to a SQL-filtered candidate set
+        for meta, recipe_id in zip(metadata, batch_df['id']):
+            meta['recipe_id'] = int(recipe_id)
         collection.add(documents=documents, metadatas=metadata, ids=ids)
         print(f"✅ Batch {start_idx // batch_size + 1} embedded.")
 
     print(f"✅ {len(filtered_df)} recipes embedded and saved to ChromaDB.")
 
+# ========================
+# STEP 4: LEXICAL INDEX
+# ========================
+
+def build_lexical_index():
+    """Build the FTS5 (BM25) index used alongside ChromaDB for hybrid retrieval"""
+    build_fts_index("recipes_clean.db")
+
+# ========================
+# STEP 5: NUTRITION PRE-FILTER
+# ========================
+
+def build_nutrition_filter(backend=DEFAULT_BACKEND):
+    """Index the numeric nutrition columns and tag Chroma metadata with recipe_id (no re-embedding)"""
+    ensure_indexes("recipes_clean.db")
+
+    client = chromadb.PersistentClient(path="chroma_db")
+    collection = get_or_create_collection(client, "recipes_collection", backend, os.getenv("OPENAI_API_KEY"))
+    tagged = tag_recipe_ids(collection)
+    print(f"✅ Nutrition indexes built, {tagged} recipes tagged with recipe_id.")
+
+# ========================
+# STEP 6: STRUCTURED INGREDIENTS
+# ========================
+
+def parse_recipe_ingredients():
+    """Parse each recipe's ingredients once into (name, qty, unit) rows for request handling"""
+    build_recipe_ingredients("recipes_clean.db")
+
 # ========================
 # MAIN
 # ========================
 
 if __name__ == "__main__":
-    embed_recipes()
+    # Usage: python full_pipeline.py [openai|local] [--reembed | --index-only]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    backend = args[0] if args else DEFAULT_BACKEND
+    if "--index-only" not in sys.argv:
+        embed_recipes(backend=backend, reembed="--reembed" in sys.argv)
+    build_lexical_index()
+    build_nutrition_filter(backend)
+    parse_recipe_ingredients()
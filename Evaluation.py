@@ -1,6 +1,25 @@
-from Full_Prompt_new import query_all
-from tqdm import tqdm
+import argparse
+import asyncio
 import json
+import os
+import time
+from tqdm import tqdm
+import Full_Prompt_new
+
+# --- Parallel, Resumable Evaluation Runner ---
+# Runs the test queries end to end (retrieval, top recipe, GPT answer) concurrently,
+# appends each finished result to a JSONL checkpoint, and skips queries that already
+# succeeded when restarted. The consolidated dataset is what ragas_eval.py reads.
+#
+# Usage: python Evaluation.py [--concurrency 4] [--rate 30] [--restart]
+#   RAGCIPE_EVAL_CONCURRENCY  queries in flight at once (default 4)
+#   RAGCIPE_EVAL_RATE         query starts per minute, 0 for no limit (default 30)
+
+CHECKPOINT_PATH = "ragcipe_eval_checkpoint.jsonl"
+DATASET_PATH = "ragcipe_ragas_dataset.json"
+EVAL_CONCURRENCY = int(os.getenv("RAGCIPE_EVAL_CONCURRENCY", "4"))
+EVAL_RATE = float(os.getenv("RAGCIPE_EVAL_RATE", "30"))
+MAX_ATTEMPTS = 3  # per query, with exponential backoff (rate limits, timeouts)
 
 # Define a set of test queries (expand this list for a more robust evaluation)
 test_queries = [
@@ -16,20 +35,115 @@ test_queries = [
     "iron rich meals for vegetarians"
 ]
 
-def evaluate_queries():
-    dataset = []
-    for query in tqdm(test_queries, desc="Evaluating queries"):
-        print(f"\n=== Evaluating Query: {query} ===")
-        result = query_all(query)
-        print("\n--- LLM Response ---")
-        print(result["answer"])
-        print("\n" + "="*80 + "\n")
-        dataset.append(result)
-    
-    # Save the dataset to a JSON file (this dataset now contains only reference-free fields)
-    with open("ragcipe_ragas_dataset.json", "w") as f:
+
+class RateLimiter:
+    """Spaces query starts at least 60 / per_minute seconds apart."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """Returns the latest checkpoint record per question."""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash; that query is simply re-run
+            records[record["question"]] = record
+    return records
+
+
+def append_checkpoint(record, path=CHECKPOINT_PATH):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+
+
+def write_dataset(queries, records, path=DATASET_PATH):
+    # Successful results in test-query order; written atomically so ragas_eval.py never reads a partial file
+    dataset = [
+        {key: records[query][key] for key in ("question", "answer", "contexts")}
+        for query in queries
+        if query in records and "error" not in records[query]
+    ]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(dataset, f, indent=2)
-    print("Dataset saved to ragcipe_ragas_dataset.json")
+    os.replace(tmp_path, path)
+    return dataset
+
+
+async def evaluate_query(query, limiter):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.wait()
+        started = time.perf_counter()
+        try:
+            result = await Full_Prompt_new.query_all_async(query)
+            return {**result, "seconds": round(time.perf_counter() - started, 2)}
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                return {"question": query, "error": f"{type(e).__name__}: {e}"}
+            await asyncio.sleep(2 ** attempt)
+
+
+async def evaluate_queries_async(queries, concurrency=EVAL_CONCURRENCY, rate=EVAL_RATE, restart=False):
+    if restart and os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+    records = load_checkpoint()
+    pending = [q for q in dict.fromkeys(queries) if q not in records or "error" in records[q]]
+    print(f"🧪 {len(queries) - len(pending)} queries already in {CHECKPOINT_PATH}, {len(pending)} to run "
+          f"(concurrency {concurrency}, {rate or 'unlimited'} per minute).")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+
+    async def run(query):
+        async with semaphore:
+            return await evaluate_query(query, limiter)
+
+    failed = 0
+    with tqdm(total=len(pending), desc="Evaluating queries") as progress:
+        for finished in asyncio.as_completed([run(query) for query in pending]):
+            record = await finished
+            append_checkpoint(record)
+            records[record["question"]] = record
+            if "error" in record:
+                failed += 1
+                tqdm.write(f"❌ {record['question']}: {record['error']}")
+            progress.update(1)
+
+    dataset = write_dataset(queries, records)
+    print(f"✅ Dataset saved to {DATASET_PATH} ({len(dataset)}/{len(queries)} queries"
+          f"{f', {failed} failed - re-run to retry them' if failed else ''}).")
+    return dataset
+
+
+def evaluate_queries(queries=test_queries, concurrency=EVAL_CONCURRENCY, rate=EVAL_RATE, restart=False):
+    Full_Prompt_new.warm_up()
+    return asyncio.run(evaluate_queries_async(queries, concurrency, rate, restart))
+
 
 if __name__ == "__main__":
-    evaluate_queries()
+    parser = argparse.ArgumentParser(description="Parallel, resumable RAGcipe evaluation")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=EVAL_RATE, help="query starts per minute, 0 for no limit")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and run every query")
+    args = parser.parse_args()
+    evaluate_queries(concurrency=args.concurrency, rate=args.rate, restart=args.restart)
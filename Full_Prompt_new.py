@@ -7,126 +7,303 @@ except ImportError:
     pass  # if pysqlite3 isn't found, fallback to system sqlite3
 
 import chromadb
-from chromadb.utils import embedding_functions
-from sentence_transformers import CrossEncoder
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import json
+import threading
+import weakref
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import requests
-from functools import lru_cache
-
-# --- URL Validation with Caching and Retry ---
-@lru_cache(maxsize=1000)
-def is_valid_url(url: str) -> bool:
-    try:
-        response = requests.head(url, allow_redirects=True, timeout=5)
-        return response.status_code == 200
-    except requests.RequestException:
-        return False
+from url_validator import validate_urls
+from embedding_backends import DEFAULT_BACKEND, get_collection, get_embedding_function
+from response_cache import ResponseCache, cache_key
+from score_cache import ScoreCache, BATCH_SIZE as RERANK_BATCH_SIZE
+import resources
+import tracing
+from lexical_index import search_recipes_fts, reciprocal_rank_fusion
+from nutrition_filter import parse_constraints, candidate_ids, chroma_id_filter, has_recipe_ids
+from cost_engine import estimate_cost, parse_servings, render_cost_table
+from ingredient_matches import load_ingredient_matches
+from ingredient_parsing import load_recipe_ingredients
+from ingredient_canon import canonicalize
+from prompt_builder import build_compact_prompt
 
 # --- Load Environment Variables ---
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
+
+# Heavy dependencies are created lazily, once per process, through the resource
+# registry; see get_client / get_cross_encoder / get_*_collection below.
+resources.register("openai_client", lambda: OpenAI(api_key=openai_api_key))
+
+def get_client():
+    return resources.get("openai_client")
+
+# AsyncOpenAI's connection pool belongs to the event loop it is used on, so there is one client per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+def async_client_factory():
+    # Replaceable for dependency injection (see openai_standin.install)
+    return AsyncOpenAI(api_key=openai_api_key)
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = async_client_factory()
+    return _async_clients[loop]
+
+# --- Async Runtime ---
+# The sync API runs the async pipeline on one long-lived event loop thread, so the
+# async client is reused across calls and callers that already run a loop still work.
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_sync(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="ragcipe-async", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(tracing.in_context(coro), _loop).result()
+
+# --- Response Cache ---
+# Bump PROMPT_TEMPLATE_VERSION whenever the prompt (prompt_builder) changes so stale answers aren't served.
+PROMPT_TEMPLATE_VERSION = 4
+LLM_MODEL = "gpt-4o"
+response_cache = ResponseCache()
 
 # --- Initialize Cross-Encoder for Reranking ---
-cross_encoder_model = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+# "torch" uses sentence-transformers; "onnx" uses ONNX Runtime (int8 when exported) and never imports torch.
+RERANKER_BACKEND = os.getenv("RAGCIPE_RERANKER_BACKEND", "torch")
+
+def _load_cross_encoder():
+    if RERANKER_BACKEND == "onnx":
+        from onnx_reranker import OnnxCrossEncoder
+        model = OnnxCrossEncoder()
+        return model, f"onnx:{model.model_path}"
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2'), "torch:cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+resources.register("cross_encoder", _load_cross_encoder)
+
+def get_cross_encoder():
+    # Returns (model, model_id)
+    return resources.get("cross_encoder")
+
+# Recipe documents are static, so (query, recipe id) scores can be reused across calls
+score_cache = ScoreCache()
 
 def rerank(query, documents, metadatas, top_k=5):
-    pairs = [(query, doc) for doc in documents]
-    scores = cross_encoder_model.predict(pairs)
+    model, model_id = get_cross_encoder()
+    doc_ids = [meta.get('id') for meta in metadatas]
+    with tracing.span("rerank", candidates=len(documents), top_k=top_k):
+        scores = score_cache.predict(model, model_id, query, documents, doc_ids)
     ranked_results = sorted(zip(documents, metadatas, scores), key=lambda x: x[2], reverse=True)
     return ranked_results[:top_k]
 
+def rerank_batch(queries, candidates, top_k=5, batch_size=RERANK_BATCH_SIZE):
+    # candidates[i] = (documents, metadatas) for queries[i]; all uncached pairs go to the model together
+    model, model_id = get_cross_encoder()
+    requests = [
+        (query, documents, [meta.get('id') for meta in metadatas])
+        for query, (documents, metadatas) in zip(queries, candidates)
+    ]
+    with tracing.span("rerank_batch", queries=len(queries), candidates=sum(len(d) for d, _ in candidates)):
+        all_scores = score_cache.predict_many(model, model_id, requests, batch_size)
+    return [
+        sorted(zip(documents, metadatas, scores), key=lambda x: x[2], reverse=True)[:top_k]
+        for (documents, metadatas), scores in zip(candidates, all_scores)
+    ]
+
+# --- Embedding Backend ("openai" or "local", set via RAGCIPE_EMBEDDING_BACKEND) ---
+# Query embeddings go through the persistent embedding cache, and each collection
+# is checked against the backend so query and index embeddings are never mixed.
+EMBEDDING_BACKEND = DEFAULT_BACKEND
+
 # --- ChromaDB Setup for Recipes ---
-recipes_client = chromadb.PersistentClient(path="chroma_db")
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=openai_api_key, model_name="text-embedding-ada-002"
-)
-recipes_collection = recipes_client.get_collection("recipes_collection", embedding_function=openai_ef)
+resources.register("recipes_client", lambda: chromadb.PersistentClient(path="chroma_db"))
+def load_recipes_collection(embedding_function=None):
+    collection = get_collection(
+        resources.get("recipes_client"), "recipes_collection", EMBEDDING_BACKEND, openai_api_key,
+        embedding_function=embedding_function
+    )
+    return collection
+
+resources.register("recipes_collection", load_recipes_collection)
+
+def get_recipes_collection():
+    return resources.get("recipes_collection")
+
+# Embeds many queries in one request for the batch path; it shares the persistent
+# embedding cache with the collection's own embedding function
+resources.register("recipes_embedding_function", lambda: get_embedding_function(EMBEDDING_BACKEND, openai_api_key))
 
 # --- ChromaDB Setup for Ingredients (FairPrice) ---
-ingredients_client = chromadb.PersistentClient(path="fairprice_openai_embeddings_db")
-ingredients_collection = ingredients_client.get_collection("fairprice_products_openai", embedding_function=openai_ef)
-
-def generate_prompt(user_query, recipe_name, recipe_url, recipe_details, nutritional_data, ingredients_from_db):
-    ingredient_str = ""
-    for ing, products in ingredients_from_db.items():
-        ingredient_str += f"\n**{ing.capitalize()}** (Price details provided):\n"
-        for prod in products:
+resources.register("ingredients_client", lambda: chromadb.PersistentClient(path="fairprice_openai_embeddings_db"))
+resources.register("ingredients_collection", lambda: get_collection(
+    resources.get("ingredients_client"), "fairprice_products_openai", EMBEDDING_BACKEND, openai_api_key
+))
+
+def get_ingredients_collection():
+    return resources.get("ingredients_collection")
+
+# Keep the old module attributes working (e.g. Full_Prompt_new.recipes_collection), built on first access
+_LAZY_ATTRIBUTES = {
+    "client": lambda: get_client(),
+    "cross_encoder_model": lambda: get_cross_encoder()[0],
+    "recipes_client": lambda: resources.get("recipes_client"),
+    "recipes_collection": lambda: get_recipes_collection(),
+    "ingredients_client": lambda: resources.get("ingredients_client"),
+    "ingredients_collection": lambda: get_ingredients_collection(),
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Warm-up ---
+def warm_up():
+    # Builds every heavy dependency and pays first-call costs (model graph, HNSW index load)
+    get_client()
+    rerank("warm up", ["Recipe Name: warm up"], [{"name": "warm up"}], top_k=1)
+    get_recipes_collection().query(query_texts=["warm up"], n_results=1, include=[])
+    get_ingredients_collection().query(query_texts=["warm up"], n_results=1, include=[])
+    print("✅ RAGcipe resources warmed up.")
+
+def start_warm_up():
+    """Starts warm_up() on a background thread so the first request doesn't pay the cold start."""
+    return resources.warm_up_in_background(warm_up)
+
+# --- Product Link Health (precomputed offline by link_health.py) ---
+# Products marked dead are filtered out of the vector search itself.
+PRODUCT_LINK_FILTER = {"url_status": {"$ne": "dead"}}
+# Link checks older than this are considered stale.
+LINK_HEALTH_MAX_AGE = 7 * 24 * 3600
+# Live HEAD checks are only a fallback for stale/unchecked products.
+LIVE_URL_FALLBACK = os.getenv("RAGCIPE_LIVE_URL_CHECK", "1") == "1"
+
+def collect_product_urls(ingredients_from_db):
+    return [
+        prod['metadata'].get('url', 'N/A')
+        for prods in ingredients_from_db.values() for prod in prods
+    ]
+
+def resolve_url_status(ingredients_from_db):
+    # Trust fresh offline checks; only stale or unchecked links go to the live validator
+    now = time.time()
+    url_status = {}
+    stale_urls = []
+    for prods in ingredients_from_db.values():
+        for prod in prods:
             meta = prod['metadata']
-            product_url = meta.get('url', 'N/A')
-            # Skip dead links using our cached URL validator
-            if product_url != 'N/A' and not is_valid_url(product_url):
+            url = meta.get('url', 'N/A')
+            if url == 'N/A':
                 continue
-            ingredient_str += f"- {meta['name']} by {meta['brand']} (Price: ${meta['price']}, Size: {meta['size']}, URL: {product_url})\n"
-    
-    prompt = f"""
-You are an expert culinary assistant.
-
-A user is seeking recipe suggestions for the query: "**{user_query}**". 
-In addition to providing a detailed recipe summary, your task is to help the user make an affordable, healthy purchase by:
-1. Analyzing the available FairPrice ingredient options and suggesting suitable ingredient substitutions clearly if any.
-2. For each necessary ingredient, among the multiple product options provided, identifying the three most relevant and cost-effective products (based on price and quantity) including their price, source URL and quantity.
-3. Providing nutritional information clearly based on the provided nutritional data.
-4. Optionally estimating the total cost of the required ingredients.
-
-Below is the retrieved recipe and a list of FairPrice ingredient products with their price and source URL information. Please include the source URL for the recipe and each product options in your response for clarity and reliability.
-
----
-
-**Retrieved Recipe:**
-- **Recipe Name:** {recipe_name}
-- **URL:** {recipe_url}
-- **Details:**
-{recipe_details}
-
-**Nutritional Information:**
-{nutritional_data}
-
----
-
-**FairPrice Ingredient Products:**
-{ingredient_str}
-
----
-
-Please provide your response in four sections:
-1. **Recipe Summary** – Summarize the key steps and ingredients in a concise and clear paragraph, including the recipe source URL.
-2. **Affordable Ingredient Recommendations** – For each necessary ingredient, identify the three most relevant and cost-effective FairPrice products (based on price and quantity), including their price, source URL an quantity.
-3. **Nutritional Analysis** – Provide a clear analysis based on the nutritional information of the recipe and the ingredients. Discuss the health benefits or potential dietary advantages (e.g., high protein content, low saturated fat, rich in fiber, etc.). Mention who might benefit from this dish (e.g., vegetarians, fitness enthusiasts, people watching cholesterol).
-4. **Cost Estimate**: 
-- Estimate the total cost to prepare this recipe using the selected FairPrice ingredients.
-- If an ingredient has multiple product options, select the most relevant, cost-effective combination (based on price and quantity) to estimate the total cost. Relevancy is more important than cost efficiency.
-- For each product in the chosen combination, include its price, quantity purchased, and URL.
-- Determine how many full servings can be made with the purchased quantities based on the recipe’s required amount of each ingredient.
-- If the initial estimate results in only 1 serving due to a limiting ingredient, suggest whether it’s reasonable to purchase more of that ingredient to increase the number of servings and lower the cost per serving.
-- Provide both:
-+ The cost per serving based on the original ingredient purchase
-+ An optimized cost per serving assuming the user buys more of the limiting ingredient (if it leads to better cost-efficiency).
-+ Break down how much each ingredient contributes to the cost of a single serving.
+            checked_at = meta.get('url_checked_at') or 0
+            if meta.get('url_status') == 'ok' and now - checked_at < LINK_HEALTH_MAX_AGE:
+                url_status[url] = True
+            else:
+                stale_urls.append(url)
+    if LIVE_URL_FALLBACK:
+        url_status.update(validate_urls(stale_urls))
+    else:
+        url_status.update({url: True for url in stale_urls})
+    return url_status
+
+COST_SECTION_PRECOMPUTED = """4. **Cost Estimate** – Reproduce the pre-computed cost estimate below exactly as given (do not recalculate any numbers). You may add one sentence of commentary.
+
+{cost_table}
 """
-    return prompt
+
+def record_usage(span, response):
+    if response.usage is not None:
+        span.set_attribute("prompt_tokens", response.usage.prompt_tokens)
+        span.set_attribute("completion_tokens", response.usage.completion_tokens)
 
 def get_llm_response(prompt, model="gpt-4o", temperature=0.3):
-    response = client.chat.completions.create(
+    with tracing.span("llm", model=model) as span:
+        response = get_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature
+        )
+        record_usage(span, response)
+    return response.choices[0].message.content.strip()
+
+async def get_llm_response_async(prompt, model="gpt-4o", temperature=0.3):
+    with tracing.span("llm", model=model) as span:
+        response = await get_async_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature
+        )
+        record_usage(span, response)
+    return response.choices[0].message.content.strip()
+
+async def stream_llm_response_async(prompt, model="gpt-4o", temperature=0.3):
+    stream = await get_async_client().chat.completions.create(
         model=model,
         messages=[{"role": "user", "content": prompt}],
-        temperature=temperature
+        temperature=temperature,
+        stream=True
     )
-    return response.choices[0].message.content.strip()
+    async for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
 
-def extract_ingredients(recipe_text):
+def stream_llm_response(prompt, model="gpt-4o", temperature=0.3):
+    # Yields the answer text chunk by chunk as GPT generates it
+    stream = get_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        stream=True
+    )
+    for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
+
+def extract_ingredient_lines(recipe_text):
+    # Maps each canonical ingredient key ("2 cloves garlic, minced" -> "garlic") to its
+    # raw recipe line, which still has the quantity. Lookups and caches use the key.
     match = re.search(r'Ingredients:(.*?)(Method|Nutritional Info)', recipe_text, re.DOTALL | re.IGNORECASE)
+    ingredient_lines = {}
     if match:
         ingredients_block = match.group(1).strip()
-        ingredients_list = [
-            re.sub(r'[\d\*\(\),]+', '', line).strip().lower()
-            for line in ingredients_block.split('\n') if line.strip()
-        ]
-        return list(set(ingredients_list))
-    return []
+        for line in ingredients_block.split('\n'):
+            if line.strip():
+                key = canonicalize(line)
+                if key:
+                    ingredient_lines.setdefault(key, line.strip())
+    return ingredient_lines
+
+def extract_ingredients(recipe_text):
+    return list(extract_ingredient_lines(recipe_text))
+
+def get_recipe_ingredients(recipe_id, recipe_text):
+    """Returns (ingredient_lines, quantities): key -> raw line, and key -> canonical (qty, unit).
+
+    Structured rows parsed at ingest time (recipe_ingredients table), in recipe order;
+    recipes that haven't been parsed yet fall back to extracting from the document,
+    with no structured quantities.
+    """
+    rows = load_recipe_ingredients(recipe_id) if recipe_id is not None else []
+    if not rows:
+        return extract_ingredient_lines(recipe_text), {}
+    ingredient_lines = {}
+    quantities = {}
+    for row in rows:
+        if row["name"] not in ingredient_lines:
+            ingredient_lines[row["name"]] = row["raw"]
+            quantities[row["name"]] = (row["qty"], row["unit"])
+    return ingredient_lines, quantities
+
+def get_ingredient_lines(recipe_id, recipe_text):
+    return get_recipe_ingredients(recipe_id, recipe_text)[0]
 
 def search_ingredients_chroma(ingredient_name, desired=3):
     # Return empty list if ingredient_name is empty or whitespace.
@@ -134,33 +311,187 @@ def search_ingredients_chroma(ingredient_name, desired=3):
         return []
     try:
         # Query more results than needed (e.g., 10)
-        results = ingredients_collection.query(
-            query_texts=[ingredient_name],
-            n_results=10,
-            include=['metadatas', 'documents', 'distances']
-        )
+        with tracing.span("search_ingredients_chroma", ingredient=ingredient_name):
+            results = get_ingredients_collection().query(
+                query_texts=[ingredient_name],
+                n_results=10,
+                where=PRODUCT_LINK_FILTER,
+                include=['metadatas', 'documents', 'distances']
+            )
         matched_products = []
-        for meta, doc, dist in zip(results['metadatas'][0], results['documents'][0], results['distances'][0]):
-            matched_products.append({"metadata": meta, "document": doc, "similarity": dist})
+        for pid, meta, doc, dist in zip(results['ids'][0], results['metadatas'][0], results['documents'][0], results['distances'][0]):
+            matched_products.append({"id": pid, "metadata": meta, "document": doc, "similarity": dist})
         # Return at most 'desired' products
         return matched_products[:desired]
     except Exception as e:
         print(f"Error querying ingredient '{ingredient_name}': {e}")
         return []
 
-def get_recipe_choices(query_text, n_results=5):
-    # Retrieve and rerank recipes from ChromaDB
-    recipe_results = recipes_collection.query(
-        query_texts=[query_text], n_results=n_results, include=['documents', 'metadatas']
+def search_ingredients_chroma_batch(ingredient_names, desired=3):
+    # Embed every ingredient in one request and run a single multi-query search,
+    # then fan the results back out per ingredient.
+    matches = {name: [] for name in ingredient_names}
+    queries = list(dict.fromkeys(
+        name for name in ingredient_names if name and name.strip()
+    ))
+    if not queries:
+        return matches
+    try:
+        with tracing.span("search_ingredients_chroma_batch", ingredients=len(queries)):
+            results = get_ingredients_collection().query(
+                query_texts=queries,
+                n_results=10,
+                where=PRODUCT_LINK_FILTER,
+                include=['metadatas', 'documents', 'distances']
+            )
+    except Exception as e:
+        # Fall back to per-ingredient lookups so one bad ingredient can't sink the batch
+        print(f"Error in batched ingredient query, retrying individually: {e}")
+        for name in queries:
+            matches[name] = search_ingredients_chroma(name, desired=desired)
+        return matches
+
+    for i, name in enumerate(queries):
+        matched_products = []
+        for pid, meta, doc, dist in zip(results['ids'][i], results['metadatas'][i], results['documents'][i], results['distances'][i]):
+            matched_products.append({"id": pid, "metadata": meta, "document": doc, "similarity": dist})
+        matches[name] = matched_products[:desired]
+    return matches
+
+# --- Hybrid Retrieval (vector + BM25, merged with reciprocal rank fusion) ---
+VECTOR_K = int(os.getenv("RAGCIPE_VECTOR_K", "10"))
+LEXICAL_K = int(os.getenv("RAGCIPE_LEXICAL_K", "10"))
+RERANK_POOL = int(os.getenv("RAGCIPE_RERANK_POOL", "8"))
+
+# Whether the recipe collection carries the recipe_id metadata the pre-filter matches on;
+# it is tagged offline (DBScript/full_pipeline.py --index-only), never on the serving path
+_prefilter_available = None
+
+def prefilter_available():
+    global _prefilter_available
+    if _prefilter_available is None:
+        _prefilter_available = has_recipe_ids(get_recipes_collection())
+        if not _prefilter_available:
+            print("⚠️ recipes_collection has no recipe_id metadata; nutrition pre-filter disabled. "
+                  "Run `python DBScript/full_pipeline.py --index-only` to tag it.")
+    return _prefilter_available
+
+def nutrition_prefilter(query_text, vector_k=VECTOR_K):
+    """Numeric nutrition constraints ("high protein", "under 400 calories") become a SQL pre-filter.
+
+    Returns (allowed_ids, chroma query kwargs, vector_k), or None when no recipe satisfies them.
+    Without recipe_id tags in the collection the filter is skipped (allowed_ids None), since
+    a `where` on the missing key would leave no vector candidates at all.
+    """
+    constraints = parse_constraints(query_text)
+    if not constraints or not prefilter_available():
+        return None, {}, vector_k
+    allowed_ids = candidate_ids(constraints)
+    if not allowed_ids:
+        return None
+    return allowed_ids, {"where": chroma_id_filter(allowed_ids)}, min(vector_k, len(allowed_ids))
+
+def fuse_candidates(vector_ids, vector_documents, vector_metadatas, lexical_ids, pool_size=RERANK_POOL):
+    # Fuse the Chroma and FTS5 rankings; returns the (documents, metadatas) rerank pool
+    candidates = {
+        recipe_id: (doc, meta)
+        for recipe_id, doc, meta in zip(vector_ids, vector_documents, vector_metadatas)
+    }
+    fused_ids = reciprocal_rank_fusion([vector_ids, lexical_ids])[:pool_size]
+
+    # Fetch documents for lexical-only hits (ids missing from Chroma are skipped)
+    missing_ids = [recipe_id for recipe_id in fused_ids if recipe_id not in candidates]
+    if missing_ids:
+        extra = get_recipes_collection().get(ids=missing_ids, include=['documents', 'metadatas'])
+        for recipe_id, doc, meta in zip(extra['ids'], extra['documents'], extra['metadatas']):
+            candidates[recipe_id] = (doc, meta)
+
+    documents, metadatas = [], []
+    for recipe_id in fused_ids:
+        if recipe_id in candidates:
+            doc, meta = candidates[recipe_id]
+            documents.append(doc)
+            # Carry the recipe ids through reranking
+            metadatas.append({**meta, "id": recipe_id})
+    return documents, metadatas
+
+def hybrid_recipe_candidates(query_text, vector_k=VECTOR_K, lexical_k=LEXICAL_K, pool_size=RERANK_POOL):
+    prefilter = nutrition_prefilter(query_text, vector_k)
+    if prefilter is None:
+        return [], []
+    allowed_ids, query_kwargs, vector_k = prefilter
+
+    def vector_search():
+        # Includes the query embedding, which Chroma computes inside query() (see the embedding span)
+        with tracing.span("vector_search", n_results=vector_k, prefiltered=allowed_ids is not None):
+            return get_recipes_collection().query(
+                query_texts=[query_text], n_results=vector_k, include=['documents', 'metadatas'],
+                **query_kwargs
+            )
+
+    # Run the Chroma and FTS5 searches in parallel, then fuse their rankings
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        vector_future = executor.submit(tracing.propagate(vector_search))
+        lexical_future = executor.submit(
+            tracing.propagate(search_recipes_fts), query_text, lexical_k, allowed_ids=allowed_ids
+        )
+        vector_results = vector_future.result()
+        lexical_ids = lexical_future.result()
+
+    return fuse_candidates(
+        vector_results['ids'][0], vector_results['documents'][0], vector_results['metadatas'][0],
+        lexical_ids, pool_size
     )
-    # Retrieve top 10 reranked recipes
-    reranked_recipes = rerank(query_text, recipe_results['documents'][0], recipe_results['metadatas'][0])
-    
+
+def hybrid_recipe_candidates_batch(queries, vector_k=VECTOR_K, lexical_k=LEXICAL_K, pool_size=RERANK_POOL):
+    """hybrid_recipe_candidates for many queries: one embedding request for all of them and
+    one multi-query Chroma search per distinct nutrition pre-filter (usually just one)."""
+    prefilters = [nutrition_prefilter(query_text, vector_k) for query_text in queries]
+    embeddings = resources.get("recipes_embedding_function")(list(queries))
+
+    groups = {}
+    for i, prefilter in enumerate(prefilters):
+        if prefilter is not None:
+            _, query_kwargs, k = prefilter
+            groups.setdefault((json.dumps(query_kwargs, sort_keys=True), k), []).append(i)
+
+    def vector_search(indices):
+        _, query_kwargs, k = prefilters[indices[0]]
+        with tracing.span("vector_search", n_results=k, queries=len(indices)):
+            results = get_recipes_collection().query(
+                query_embeddings=[embeddings[i] for i in indices], n_results=k,
+                include=['documents', 'metadatas'], **query_kwargs
+            )
+        return {
+            i: (results['ids'][j], results['documents'][j], results['metadatas'][j])
+            for j, i in enumerate(indices)
+        }
+
+    def lexical_search():
+        return [
+            search_recipes_fts(query_text, lexical_k, allowed_ids=prefilter[0]) if prefilter is not None else []
+            for query_text, prefilter in zip(queries, prefilters)
+        ]
+
+    with ThreadPoolExecutor(max_workers=len(groups) + 1) as executor:
+        lexical_future = executor.submit(tracing.propagate(lexical_search))
+        vector_results = {}
+        for result in executor.map(tracing.propagate(vector_search), groups.values()):
+            vector_results.update(result)
+        lexical_ids = lexical_future.result()
+
+    return [
+        fuse_candidates(*vector_results[i], lexical_ids[i], pool_size) if i in vector_results else ([], [])
+        for i in range(len(queries))
+    ]
+
+def recipe_choice_list(reranked_recipes):
     # Build a list of recipe choices with relevant details including URL
     recipe_choices = []
     for idx, (doc, meta, _) in enumerate(reranked_recipes):
         recipe_choices.append({
             "index": idx,
+            "id": meta['id'],
             "name": meta['name'],
             "document": doc,
             "metadata": meta,
@@ -168,48 +499,213 @@ def get_recipe_choices(query_text, n_results=5):
         })
     return recipe_choices
 
-def process_selected_recipe(query_text, selected_recipe):
-    recipe_doc = selected_recipe["document"]
-    recipe_meta = selected_recipe["metadata"]
-    
-    # Extract nutritional data if available
-    nutritional_data = "Not Available"
+def get_recipe_choices(query_text, n_results=5):
+    # Retrieve hybrid candidates and rerank them with the cross-encoder
+    with tracing.span("get_recipe_choices", n_results=n_results) as span:
+        documents, metadatas = hybrid_recipe_candidates(query_text)
+        span.set_attribute("candidates", len(documents))
+        reranked_recipes = rerank(query_text, documents, metadatas, top_k=n_results)
+    return recipe_choice_list(reranked_recipes)
+
+def get_recipe_choices_batch(queries, n_results=5, batch_size=RERANK_BATCH_SIZE):
+    """get_recipe_choices for many queries at once, with the same results.
+
+    All queries are embedded in one request, searched with a multi-query Chroma call,
+    and all (query, doc) pairs are scored in one cross-encoder batch.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    with tracing.span("get_recipe_choices_batch", queries=len(queries), n_results=n_results):
+        candidates = hybrid_recipe_candidates_batch(queries)
+        reranked = rerank_batch(queries, candidates, top_k=n_results, batch_size=batch_size)
+    return [recipe_choice_list(reranked_recipes) for reranked_recipes in reranked]
+
+def extract_nutritional_data(recipe_doc):
     if "Nutritional Info" in recipe_doc:
-        nutritional_data = recipe_doc.split("Nutritional Info:")[-1].strip().split("\n\n")[0].strip()
+        return recipe_doc.split("Nutritional Info:")[-1].strip().split("\n\n")[0].strip()
+    return "Not Available"
+
+async def prepare_recipe_async(selected_recipe):
+    """Query-independent stages for a recipe: returns (ingredient_lines, quantities, ingredients_from_db, url_status).
 
-    # Dynamically extract ingredients from recipe text
-    ingredients_keywords = extract_ingredients(recipe_doc)
+    Blocking stages (SQLite, Chroma, link checks) run in worker threads; the
+    ingredient rows and the materialized product matches are read concurrently.
+    """
+    recipe_doc = selected_recipe["document"]
+    recipe_id = selected_recipe.get("id")
 
-    # Query ingredients dynamically from ChromaDB embeddings with desired=3 options per ingredient
-    ingredients_from_db = {
-        ing: search_ingredients_chroma(ing, desired=3) for ing in ingredients_keywords
+    with tracing.span("prepare_recipe", recipe_id=recipe_id) as span:
+        # Ingredients (and their quantity lines) as parsed at ingest time, and the product
+        # matches materialized offline by ingredient_matches.py
+        (ingredient_lines, quantities), ingredients_from_db = await asyncio.gather(
+            asyncio.to_thread(get_recipe_ingredients, recipe_id, recipe_doc),
+            asyncio.to_thread(load_ingredient_matches, recipe_id) if recipe_id is not None else asyncio.sleep(0)
+        )
+        span.set_attribute("ingredients", len(ingredient_lines))
+        span.set_attribute("matches_materialized", ingredients_from_db is not None)
+        if ingredients_from_db is None:
+            # Not materialized: query all ingredients from ChromaDB in one batch with desired=3 options each
+            ingredients_from_db = await asyncio.to_thread(search_ingredients_chroma_batch, list(ingredient_lines), 3)
+
+        # Resolve link health once for both the prompt and the contexts
+        url_status = await asyncio.to_thread(resolve_url_status, ingredients_from_db)
+    return ingredient_lines, quantities, ingredients_from_db, url_status
+
+def prepare_recipe(selected_recipe):
+    return run_sync(prepare_recipe_async(selected_recipe))
+
+async def build_recipe_prompt_async(query_text, selected_recipe, prepared=None):
+    """Everything up to the LLM call: returns the prompt, the evaluation contexts and the
+    link references that expand the answer.
+
+    `prepared` is a prepare_recipe result computed ahead of time (see prefetch.py).
+    """
+    started = time.perf_counter()
+    with tracing.span("build_recipe_prompt", prefetched=prepared is not None):
+        if prepared is None:
+            prepared = await prepare_recipe_async(selected_recipe)
+        prompt, contexts, refs = assemble_recipe_prompt(query_text, selected_recipe, *prepared)
+    print(f"⏱️ Prompt ready in {time.perf_counter() - started:.2f}s.")
+    return prompt, contexts, refs
+
+def build_recipe_prompt(query_text, selected_recipe, prepared=None):
+    return run_sync(build_recipe_prompt_async(query_text, selected_recipe, prepared))
+
+def assemble_recipe_prompt(query_text, selected_recipe, ingredient_lines, quantities, ingredients_from_db, url_status):
+    recipe_doc = selected_recipe["document"]
+    recipe_meta = selected_recipe["metadata"]
+    nutritional_data = extract_nutritional_data(recipe_doc)
+
+    # Compute the cost table in Python instead of asking the LLM to do the arithmetic
+    live_products = {
+        ing: [
+            prod for prod in prods
+            if prod['metadata'].get('url', 'N/A') == 'N/A' or url_status.get(prod['metadata'].get('url', 'N/A'), False)
+        ]
+        for ing, prods in ingredients_from_db.items()
     }
+    cost_table = render_cost_table(estimate_cost(ingredient_lines, live_products, quantities, parse_servings(recipe_doc)))
 
-    # Generate prompt dynamically
-    prompt = generate_prompt(
+    # Compact, token-budgeted prompt; links are shortened to reference ids expanded in the answer
+    prompt, refs, _ = build_compact_prompt(
         user_query=query_text,
         recipe_name=recipe_meta['name'],
         recipe_url=recipe_meta.get('url', 'N/A'),
-        recipe_details=recipe_doc,
+        recipe_doc=recipe_doc,
+        ingredient_lines=ingredient_lines,
         nutritional_data=nutritional_data,
-        ingredients_from_db=ingredients_from_db
+        ingredients_from_db=ingredients_from_db,
+        url_status=url_status,
+        cost_section=COST_SECTION_PRECOMPUTED.format(cost_table=cost_table)
     )
 
-    llm_response = get_llm_response(prompt)
+    contexts = [
+        f"Recipe Details: {recipe_doc}",
+        f"Nutritional Information: {nutritional_data}",
+        f"Cost Estimate: {cost_table}"
+    ] + [
+        f"FairPrice Ingredient: {prod['metadata']['name']} by {prod['metadata']['brand']} (Price: ${prod['metadata']['price']}, Size: {prod['metadata']['size']}, URL: {prod['metadata'].get('url', 'N/A')})"
+        for ing, prods in ingredients_from_db.items() for prod in prods
+        if prod['metadata'].get('url', 'N/A') == 'N/A' or url_status.get(prod['metadata'].get('url', 'N/A'), False)
+    ]
+    return prompt, contexts, refs
+
+def response_cache_key(query_text, selected_recipe):
+    recipe_id = selected_recipe.get("id") or selected_recipe["metadata"].get("url") or selected_recipe["name"]
+    return recipe_id, cache_key(recipe_id, query_text, PROMPT_TEMPLATE_VERSION, LLM_MODEL)
+
+async def process_selected_recipe_async(query_text, selected_recipe, prepared=None):
+    with tracing.span("process_selected_recipe") as span:
+        recipe_id, key = response_cache_key(query_text, selected_recipe)
+        cached = response_cache.get(key)
+        span.set_attribute("response_cache_hit", cached is not None)
+        if cached is not None:
+            return {**cached, "question": query_text}
+
+        prompt, contexts, refs = await build_recipe_prompt_async(query_text, selected_recipe, prepared)
+        llm_response = refs.expand(await get_llm_response_async(prompt, model=LLM_MODEL))
 
-    return {
+    result = {
         "question": query_text,
         "answer": llm_response,
-        "contexts": [
-            f"Recipe Details: {recipe_doc}",
-            f"Nutritional Information: {nutritional_data}"
-        ] + [
-            f"FairPrice Ingredient: {prod['metadata']['name']} by {prod['metadata']['brand']} (Price: ${prod['metadata']['price']}, Size: {prod['metadata']['size']}, URL: {prod['metadata'].get('url', 'N/A')})"
-            for ing, prods in ingredients_from_db.items() for prod in prods
-            if prod['metadata'].get('url', 'N/A') == 'N/A' or is_valid_url(prod['metadata'].get('url', 'N/A'))
-        ]
+        "contexts": contexts
     }
+    response_cache.put(key, recipe_id, result)
+    return result
+
+def process_selected_recipe(query_text, selected_recipe, prepared=None):
+    return run_sync(process_selected_recipe_async(query_text, selected_recipe, prepared))
+
+def process_selected_recipe_stream(query_text, selected_recipe, prepared=None):
+    """Streaming variant of process_selected_recipe.
+
+    Returns (chunks, result): `chunks` yields answer text as it is generated
+    (e.g. for st.write_stream), and `result` is the usual evaluation dict whose
+    "answer" is filled in once the stream has been consumed.
+    """
+    # The span covers everything up to the first pull; the llm_stream child covers generation
+    with tracing.span("process_selected_recipe", stream=True) as span:
+        recipe_id, key = response_cache_key(query_text, selected_recipe)
+        cached = response_cache.get(key)
+        span.set_attribute("response_cache_hit", cached is not None)
+        if cached is not None:
+            result = {**cached, "question": query_text}
+            return iter([result["answer"]]), result
+
+        prompt, contexts, refs = build_recipe_prompt(query_text, selected_recipe, prepared)
+        llm_chunks = tracing.traced_stream(stream_llm_response(prompt, model=LLM_MODEL), "llm_stream", model=LLM_MODEL)
+    result = {"question": query_text, "answer": "", "contexts": contexts}
+
+    def chunks():
+        parts = []
+        for chunk in refs.expand_stream(llm_chunks):
+            parts.append(chunk)
+            yield chunk
+        result["answer"] = "".join(parts).strip()
+        response_cache.put(key, recipe_id, result)
+
+    return chunks(), result
+
+async def process_selected_recipe_stream_async(query_text, selected_recipe, prepared=None):
+    """Async variant of process_selected_recipe_stream; `chunks` is an async generator."""
+    with tracing.span("process_selected_recipe", stream=True) as span:
+        recipe_id, key = response_cache_key(query_text, selected_recipe)
+        cached = response_cache.get(key)
+        span.set_attribute("response_cache_hit", cached is not None)
+        if cached is not None:
+            result = {**cached, "question": query_text}
+
+            async def cached_chunks():
+                yield result["answer"]
+            return cached_chunks(), result
+
+        prompt, contexts, refs = await build_recipe_prompt_async(query_text, selected_recipe, prepared)
+        llm_chunks = tracing.traced_stream_async(
+            stream_llm_response_async(prompt, model=LLM_MODEL), "llm_stream", model=LLM_MODEL
+        )
+    result = {"question": query_text, "answer": "", "contexts": contexts}
+
+    async def chunks():
+        parts = []
+        async for chunk in refs.expand_stream_async(llm_chunks):
+            parts.append(chunk)
+            yield chunk
+        result["answer"] = "".join(parts).strip()
+        response_cache.put(key, recipe_id, result)
+
+    return chunks(), result
+
+async def query_all_async(query_text, n_results=3):
+    """End to end for one query with the top-ranked recipe; returns the evaluation
+    dict (question, answer, contexts) used by Evaluation.py / ragas_eval.py."""
+    recipe_choices = await asyncio.to_thread(get_recipe_choices, query_text, n_results)
+    if not recipe_choices:
+        return {"question": query_text, "answer": "No recipes found for your query.", "contexts": []}
+    return await process_selected_recipe_async(query_text, recipe_choices[0])
 
+def query_all(query_text, n_results=3):
+    return run_sync(query_all_async(query_text, n_results))
 
 if __name__ == "__main__":
     query_text = "cheap high protein tofu dish"
@@ -9,7 +9,6 @@ except ImportError:
     pass
 
 import chromadb
-from chromadb.utils import embedding_functions
 from sentence_transformers import CrossEncoder
 from openai import OpenAI
 import os
@@ -17,6 +16,8 @@ import re
 from dotenv import load_dotenv
 import requests
 from functools import lru_cache
+from embedding_backends import DEFAULT_BACKEND, get_collection
+from score_cache import ScoreCache
 
 # --- URL Validation with Caching and Retry ---
 @lru_cache(maxsize=1000)
@@ -34,10 +35,17 @@ client = OpenAI(api_key=openai_api_key)
 
 # --- Initialize Cross-Encoder for Reranking ---
 cross_encoder_model = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+score_cache = ScoreCache()
 
 def rerank(query, documents, metadatas, top_k=5):
-    pairs = [(query, doc) for doc in documents]
-    scores = cross_encoder_model.predict(pairs)
+    doc_ids = [meta.get('id') for meta in metadatas]
+    scores = score_cache.predict(
+        cross_encoder_model,
+        'cross-encoder/ms-marco-MiniLM-L-6-v2',
+        query,
+        documents,
+        doc_ids
+    )
     ranked_results = sorted(
         zip(documents, metadatas, scores), 
         key=lambda x: x[2], 
@@ -47,20 +55,20 @@ def rerank(query, documents, metadatas, top_k=5):
 
 # --- ChromaDB Setup for Recipes ---
 recipes_client = chromadb.PersistentClient(path="chroma_db")
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=openai_api_key, 
-    model_name="text-embedding-ada-002"
-)
-recipes_collection = recipes_client.get_collection(
-    "recipes_collection", 
-    embedding_function=openai_ef
+recipes_collection = get_collection(
+    recipes_client,
+    "recipes_collection",
+    DEFAULT_BACKEND,
+    openai_api_key
 )
 
 # --- ChromaDB Setup for Ingredients (FairPrice) ---
 ingredients_client = chromadb.PersistentClient(path="fairprice_openai_embeddings_db")
-ingredients_collection = ingredients_client.get_collection(
-    "fairprice_products_openai", 
-    embedding_function=openai_ef
+ingredients_collection = get_collection(
+    ingredients_client,
+    "fairprice_products_openai",
+    DEFAULT_BACKEND,
+    openai_api_key
 )
 
 def generate_prompt(user_query, recipe_name, recipe_url, recipe_details, nutritional_data, ingredients_from_db):
@@ -189,10 +197,15 @@ def get_recipe_choices(query_text, n_results=3):
         n_results=20,
         include=['documents', 'metadatas']
     )
+    # Carry the recipe ids through reranking (used as score cache keys)
+    metadatas = [
+        {**meta, "id": recipe_id}
+        for meta, recipe_id in zip(recipe_results['metadatas'][0], recipe_results['ids'][0])
+    ]
     reranked = rerank(
         query_text,
         recipe_results['documents'][0],
-        recipe_results['metadatas'][0],
+        metadatas,
         top_k=20
     )
     
@@ -295,3 +308,4 @@ if __name__ == "__main__":
         print(f"\nQuery: {q}")
         ans = query_all(q)
         print(ans)
+    print(f"\nCross-encoder score cache: {score_cache.stats()}")
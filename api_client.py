@@ -0,0 +1,59 @@
+import json
+import os
+import httpx
+from httpx_sse import connect_sse
+
+# --- Thin Client for the RAGcipe HTTP Service ---
+# Same call signatures as the Full_Prompt_new functions app.py uses, backed by
+# api_server.py at RAGCIPE_API_URL (e.g. http://localhost:8000).
+
+API_URL = os.getenv("RAGCIPE_API_URL", "")
+REQUEST_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
+_client = None
+
+
+def get_http_client():
+    # One pooled connection per process, reused across requests
+    global _client
+    if _client is None:
+        _client = httpx.Client(base_url=API_URL, timeout=REQUEST_TIMEOUT)
+    return _client
+
+
+def get_recipe_choices(query_text, n_results=5):
+    response = get_http_client().post("/choices", json={"query": query_text, "n_results": n_results})
+    response.raise_for_status()
+    return response.json()["choices"]
+
+
+def process_selected_recipe(query_text, selected_recipe):
+    response = get_http_client().post("/process", json={"query": query_text, "recipe": selected_recipe})
+    response.raise_for_status()
+    return response.json()
+
+
+def process_selected_recipe_stream(query_text, selected_recipe):
+    """Returns (chunks, result) like Full_Prompt_new.process_selected_recipe_stream."""
+    result = {"question": query_text, "answer": "", "contexts": []}
+
+    def chunks():
+        payload = {"query": query_text, "recipe": selected_recipe}
+        with connect_sse(get_http_client(), "POST", "/process/stream", json=payload) as source:
+            for event in source.iter_sse():
+                data = json.loads(event.data)
+                if event.event == "result":
+                    result.update(data)
+                elif event.event == "error":
+                    raise RuntimeError(data["detail"])
+                else:
+                    yield data["chunk"]
+
+    return chunks(), result
+
+
+def process_batch(items):
+    """items: [{"query": ..., "recipe": optional choice}] -> results in the same order."""
+    response = get_http_client().post("/batch", json={"items": items})
+    response.raise_for_status()
+    return response.json()["results"]
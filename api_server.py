@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import Full_Prompt_new
+import tracing
+
+# --- RAGcipe HTTP Service ---
+# Serves the retrieval and generation pipeline over HTTP so front-ends (app.py with
+# RAGCIPE_API_URL set, evaluation scripts, ...) share warm models instead of loading
+# their own. Each worker process warms up once at startup and then reuses the
+# reranker, the Chroma collections and the pooled OpenAI / link-check clients.
+#
+# Run:  python api_server.py            (RAGCIPE_API_HOST / _PORT / _WORKERS)
+#  or:  uvicorn api_server:app --workers 4
+
+API_HOST = os.getenv("RAGCIPE_API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("RAGCIPE_API_PORT", "8000"))
+API_WORKERS = int(os.getenv("RAGCIPE_API_WORKERS", "2"))
+# Items of a batch request processed at the same time (per worker)
+BATCH_CONCURRENCY = int(os.getenv("RAGCIPE_BATCH_CONCURRENCY", "4"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up before accepting traffic, so no request pays the cold start
+    await asyncio.to_thread(Full_Prompt_new.warm_up)
+    yield
+
+
+app = FastAPI(title="RAGcipe", lifespan=lifespan)
+tracing.instrument_fastapi(app)
+
+
+class ChoicesRequest(BaseModel):
+    query: str
+    n_results: int = 5
+
+
+class ProcessRequest(BaseModel):
+    query: str
+    recipe: dict
+
+
+class BatchItem(BaseModel):
+    query: str
+    # Recipe choice to process; the top-ranked choice for the query when omitted
+    recipe: Optional[dict] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+
+async def recipe_choices(query, n_results=5):
+    # Retrieval and reranking are blocking (Chroma, cross-encoder), so they run in a worker thread
+    return await asyncio.to_thread(Full_Prompt_new.get_recipe_choices, query, n_results)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/choices")
+async def choices(request: ChoicesRequest):
+    return {"query": request.query, "choices": await recipe_choices(request.query, request.n_results)}
+
+
+@app.post("/process")
+async def process(request: ProcessRequest):
+    return await Full_Prompt_new.process_selected_recipe_async(request.query, request.recipe)
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.post("/process/stream")
+async def process_stream(request: ProcessRequest):
+    """Server-sent events: `data: {"chunk": ...}` per answer chunk, then one `result` event."""
+    chunks, result = await Full_Prompt_new.process_selected_recipe_stream_async(request.query, request.recipe)
+
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield sse_event({"chunk": chunk})
+            yield sse_event(result, event="result")
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/batch")
+async def batch(request: BatchRequest):
+    """Processes many (query, recipe) items concurrently; results are returned in request order."""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to process.")
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    # Items without a recipe get their top choice from one batched retrieval pass
+    open_queries = [item.query for item in request.items if item.recipe is None]
+    top_choices = dict(zip(open_queries, await asyncio.to_thread(
+        Full_Prompt_new.get_recipe_choices_batch, open_queries, 1
+    )))
+
+    async def run(item):
+        async with semaphore:
+            try:
+                recipe = item.recipe
+                if recipe is None:
+                    if not top_choices[item.query]:
+                        return {"question": item.query, "error": "No matching recipe found."}
+                    recipe = top_choices[item.query][0]
+                return await Full_Prompt_new.process_selected_recipe_async(item.query, recipe)
+            except Exception as e:
+                return {"question": item.query, "error": str(e)}
+
+    return {"results": await asyncio.gather(*(run(item) for item in request.items))}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api_server:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
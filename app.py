@@ -2,10 +2,22 @@ import sys
 sys.modules["torch.classes"] = None
 
 # app.py
+import contextlib
+import time
 import streamlit as st
-import os
-import importlib
-import Full_Prompt_new  # Ensure this file is in your project folder
+import api_client
+
+# With RAGCIPE_API_URL set, the app is a thin client of api_server.py and loads no models itself
+if api_client.API_URL:
+    backend = api_client
+    prefetch = None
+else:
+    import Full_Prompt_new  # Ensure this file is in your project folder
+    import prefetch
+    backend = Full_Prompt_new
+
+# Seconds between re-renders of the streamed answer; each render sends the whole text so far
+STREAM_RENDER_INTERVAL = 0.1
 
 # Custom CSS to style the page
 st.markdown(
@@ -39,7 +51,19 @@ st.markdown(
 )
 
 
+@st.cache_resource
+def warm_start():
+    # Runs once per server process: loads the reranker and collections in the
+    # background while the page renders, so the first query doesn't pay for it.
+    if backend is not api_client:
+        return Full_Prompt_new.start_warm_up()
+
+
 def main():
+    warm_start()
+    if prefetch is not None and "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = prefetch.Prefetcher()
+    prefetcher = st.session_state.get("prefetcher")
     st.markdown("<div class='header'>✨ RAGcipe Culinary Assistant ✨</div>", unsafe_allow_html=True)
     
     # User enters the query
@@ -47,7 +71,14 @@ def main():
     # 1) Button to retrieve recipe choices
     if st.button("🚀 Get Recipe Choices"):
         with st.spinner("⏳ Querying recipes... Please wait."):
-            recipe_choices = Full_Prompt_new.get_recipe_choices(query)
+            if prefetcher is None:
+                recipe_choices = backend.get_recipe_choices(query)
+            else:
+                prefetcher.cancel()
+                with prefetch.foreground():
+                    recipe_choices = backend.get_recipe_choices(query)
+                # Prepare every displayed recipe in the background while the user decides
+                prefetcher.start(recipe_choices)
             # Store in session state so we can display them below
             st.session_state.recipe_choices = recipe_choices
             st.session_state.user_query = query
@@ -134,20 +165,37 @@ def main():
         if submitted:
             selected_recipe = recipe_choices[selected_recipe_idx]
 
-            with st.spinner("🥘 Mixing ingredients and machine learning..."):
-                # 4) Process the chosen recipe to get the LLM response
-                response = Full_Prompt_new.process_selected_recipe(
-                    st.session_state.user_query,
-                    selected_recipe
-                )
-                
-                if isinstance(response, dict) and "answer" in response:
-                    formatted_response = response["answer"]
-                else:
-                    formatted_response = str(response)
-                
+            # Queued prefetches (this session's or others') stay paused until the answer has
+            # finished streaming, not just until the prompt is built
+            foreground = contextlib.nullcontext() if prefetcher is None else prefetch.foreground()
+            with foreground:
+                with st.spinner("🥘 Mixing ingredients and machine learning..."):
+                    # 4) Prepare the prompt for the chosen recipe, starting from the prefetched stages if ready
+                    if prefetcher is None:
+                        chunks, _ = backend.process_selected_recipe_stream(
+                            st.session_state.user_query,
+                            selected_recipe
+                        )
+                    else:
+                        chunks, _ = backend.process_selected_recipe_stream(
+                            st.session_state.user_query,
+                            selected_recipe,
+                            prepared=prefetcher.take(selected_recipe)
+                        )
+
+                # 5) Render the LLM response progressively as it is generated; markdown with HTML
+                #    enabled like the full response was, so links and tables aren't shown as raw markup
                 st.subheader("🧂 Seasoned with AI, Served with Love")
-                st.markdown(formatted_response, unsafe_allow_html=True)
+                placeholder = st.empty()
+                parts = []
+                last_render = 0.0
+                for chunk in chunks:
+                    parts.append(chunk)
+                    now = time.monotonic()
+                    if now - last_render >= STREAM_RENDER_INTERVAL:
+                        placeholder.markdown("".join(parts), unsafe_allow_html=True)
+                        last_render = now
+                placeholder.markdown("".join(parts), unsafe_allow_html=True)
     
     st.markdown("<div class='footer'>© 2025 RAGcipe Team - Powered by OpenAI & FairPrice Data</div>", unsafe_allow_html=True)
 
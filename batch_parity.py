@@ -0,0 +1,69 @@
+import sys
+import time
+import pandas as pd
+import Full_Prompt_new
+
+# --- Batch Retrieval Parity & Throughput Check ---
+# Verifies that get_recipe_choices_batch returns the same choices (ids, order and
+# cross-encoder scores) as get_recipe_choices on the evaluation prompts, then
+# reports queries per second for several batch sizes.
+#
+# Usage: python batch_parity.py [batch sizes, e.g. 1 4 16 64]
+
+SCORE_TOLERANCE = 1e-4  # padding differs between batch compositions, so scores may differ in float noise
+
+
+def load_queries(path="Evaluation_Recipes/Evaluation_Dataset_Recipes.csv"):
+    return pd.read_csv(path)["prompt"].dropna().tolist()
+
+
+def choice_scores(query, choices):
+    model, model_id = Full_Prompt_new.get_cross_encoder()
+    return Full_Prompt_new.score_cache.predict(
+        model, model_id, query, [c["document"] for c in choices], [c["id"] for c in choices]
+    )
+
+
+def check_parity(queries):
+    Full_Prompt_new.score_cache = Full_Prompt_new.ScoreCache()
+    single = [Full_Prompt_new.get_recipe_choices(query) for query in queries]
+    single_scores = [choice_scores(q, c) for q, c in zip(queries, single)]
+
+    Full_Prompt_new.score_cache = Full_Prompt_new.ScoreCache()
+    batch = Full_Prompt_new.get_recipe_choices_batch(queries)
+    model, model_id = Full_Prompt_new.get_cross_encoder()
+    batch_scores = Full_Prompt_new.score_cache.predict_many(
+        model, model_id, [(q, [c["document"] for c in cs], [c["id"] for c in cs]) for q, cs in zip(queries, batch)]
+    )
+
+    mismatches = 0
+    max_diff = 0.0
+    for query, a, b, sa, sb in zip(queries, single, batch, single_scores, batch_scores):
+        if [c["id"] for c in a] != [c["id"] for c in b]:
+            mismatches += 1
+            print(f"❌ '{query}': {[c['id'] for c in a]} vs {[c['id'] for c in b]}")
+        max_diff = max([max_diff] + [abs(x - y) for x, y in zip(sa, sb)])
+    status = "✅" if mismatches == 0 and max_diff <= SCORE_TOLERANCE else "❌"
+    print(f"{status} Parity: {len(queries) - mismatches}/{len(queries)} identical rankings, "
+          f"max score difference {max_diff:.2e}.")
+    return mismatches == 0 and max_diff <= SCORE_TOLERANCE
+
+
+def measure_throughput(queries, batch_sizes):
+    # The embedding cache is warm after the parity run, so this measures search + reranking
+    for batch_size in batch_sizes:
+        Full_Prompt_new.score_cache = Full_Prompt_new.ScoreCache()
+        started = time.perf_counter()
+        for start in range(0, len(queries), batch_size):
+            Full_Prompt_new.get_recipe_choices_batch(queries[start:start + batch_size])
+        elapsed = time.perf_counter() - started
+        print(f"⏱️ batch size {batch_size:>3}: {len(queries) / elapsed:.1f} queries/s")
+
+
+if __name__ == "__main__":
+    queries = load_queries()
+    batch_sizes = [int(arg) for arg in sys.argv[1:]] or [1, 4, 16, len(queries)]
+    Full_Prompt_new.warm_up()
+    ok = check_parity(queries)
+    measure_throughput(queries, batch_sizes)
+    sys.exit(0 if ok else 1)
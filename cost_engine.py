@@ -0,0 +1,277 @@
+import re
+import numpy as np
+
+# --- Deterministic Cost-per-Serving Engine ---
+# Parses FairPrice pack sizes and recipe quantities into canonical units and
+# computes the purchase plan, cost per serving and the optimized cost for the
+# limiting ingredient, so the LLM only has to present the numbers.
+#
+# Quantities are for one batch of the recipe. Costs are per serving when the recipe
+# states its servings ("Serves: 4"), and per recipe batch otherwise.
+#
+# Canonical units: "g" for mass, "ml" for volume, "count" for pieces. Mass and
+# volume are treated as interchangeable at 1 g/ml since recipes mix them freely.
+
+MAX_BATCHES = 12
+SERVINGS_RE = re.compile(r"\bserves\s*:?\s*(\d+)\b|\b(\d+)\s+servings\b", re.IGNORECASE)
+
+UNIT_FACTORS = {
+    # mass -> g
+    "mg": ("g", 0.001), "g": ("g", 1), "gm": ("g", 1), "gms": ("g", 1), "gram": ("g", 1), "grams": ("g", 1),
+    "kg": ("g", 1000),
+    # volume -> ml
+    "ml": ("ml", 1), "l": ("ml", 1000), "litre": ("ml", 1000), "liter": ("ml", 1000), "litres": ("ml", 1000),
+    "liters": ("ml", 1000),
+    "tsp": ("ml", 5), "teaspoon": ("ml", 5), "teaspoons": ("ml", 5),
+    "tbsp": ("ml", 15), "tablespoon": ("ml", 15), "tablespoons": ("ml", 15),
+    "cup": ("ml", 250), "cups": ("ml", 250),
+    # pieces
+    "pc": ("count", 1), "pcs": ("count", 1), "piece": ("count", 1), "pieces": ("count", 1),
+    "clove": ("count", 1), "cloves": ("count", 1), "stalk": ("count", 1), "stalks": ("count", 1),
+    "slice": ("count", 1), "slices": ("count", 1), "sprig": ("count", 1), "sprigs": ("count", 1),
+    "egg": ("count", 1), "eggs": ("count", 1), "punnet": ("count", 1), "tin": ("count", 1),
+    "can": ("count", 1), "pack": ("count", 1), "packs": ("count", 1), "bunch": ("count", 1),
+}
+
+FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+
+# Mixed numbers ("1½", "2 1/2") come first so the whole part isn't matched on its own
+NUMBER = r"\d+\s*[½¼¾⅓⅔⅛]|\d+\s+\d+\s*/\s*\d+|\d+(?:\.\d+)?(?:\s*/\s*\d+)?|[½¼¾⅓⅔⅛]"
+MIXED_RE = re.compile(r"(\d+)\s+(\d+\s*/\s*\d+)")
+UNIT = "|".join(sorted(UNIT_FACTORS, key=len, reverse=True))
+QUANTITY_RE = re.compile(
+    rf"(?P<num>{NUMBER})(?:\s*[-–]\s*(?P<upper>{NUMBER}))?\s*(?P<unit>(?:{UNIT})\b)?",
+    re.IGNORECASE
+)
+MULTIPACK_RE = re.compile(rf"(?P<count>\d+)\s*[x×]\s*(?P<num>{NUMBER})\s*(?P<unit>{UNIT})\b", re.IGNORECASE)
+PER_PACK_RE = re.compile(r"(?P<count>\d+)\s*(?:per\s+pack|pcs?|pieces?|sticks?|'s)\b", re.IGNORECASE)
+
+
+def _to_number(text):
+    text = text.strip()
+    if text in FRACTIONS:
+        return FRACTIONS[text]
+    if text[-1] in FRACTIONS:
+        return float(text[:-1]) + FRACTIONS[text[-1]]
+    mixed = MIXED_RE.fullmatch(text)
+    if mixed:
+        fraction = _to_number(mixed.group(2))
+        return float(mixed.group(1)) + fraction if fraction is not None else None
+    if "/" in text:
+        numerator, denominator = (float(part) for part in text.split("/"))
+        return numerator / denominator if denominator else None
+    return float(text)
+
+
+def _canonical(amount, unit):
+    dimension, factor = UNIT_FACTORS.get((unit or "").lower(), ("count", 1))
+    return amount * factor, dimension
+
+
+def parse_quantity(text):
+    """Parses a recipe ingredient line, e.g. 'Garlic, minced, 1 tsp' -> (5.0, 'ml').
+
+    Ranges use the upper bound. Returns None when no amount is given ('To taste').
+    """
+    text = text or ""
+    # "1 x 400g can": the amount is count x size, not the leading count
+    match = MULTIPACK_RE.search(text)
+    if match:
+        amount, dimension = _canonical(_to_number(match.group("num")), match.group("unit"))
+        return amount * int(match.group("count")), dimension
+    for match in QUANTITY_RE.finditer(text):
+        amount = _to_number(match.group("upper") or match.group("num"))
+        if amount:
+            return _canonical(amount, match.group("unit"))
+    return None
+
+
+def parse_size(size):
+    """Parses a FairPrice size string, e.g. '6 x 70g' -> (420.0, 'g'), '1L' -> (1000.0, 'ml')."""
+    if not size or size == "Not specified":
+        return None
+    match = MULTIPACK_RE.search(size)
+    if match:
+        amount, dimension = _canonical(_to_number(match.group("num")), match.group("unit"))
+        return amount * int(match.group("count")), dimension
+    match = PER_PACK_RE.search(size)
+    if match:
+        return float(match.group("count")), "count"
+    for match in QUANTITY_RE.finditer(size):
+        amount = _to_number(match.group("num"))
+        if amount:
+            return _canonical(amount, match.group("unit"))
+    return None
+
+
+def _compatible(required, pack):
+    mass_volume = {"g", "ml"}
+    return required[1] == pack[1] or (required[1] in mass_volume and pack[1] in mass_volume)
+
+
+def choose_product(required, products):
+    """Picks the most relevant product (first in similarity order) with a usable price and size.
+
+    Returns (metadata, pack, comparable); comparable is False when the recipe amount
+    can't be converted to the pack's unit, in which case one pack is assumed.
+    """
+    fallback = (None, None, False)
+    for prod in products:
+        meta = prod['metadata']
+        price = meta.get('price', -1)
+        pack = parse_size(meta.get('size'))
+        if price is None or price <= 0 or pack is None:
+            continue
+        if required is not None and _compatible(required, pack):
+            return meta, pack, True
+        if fallback[0] is None:
+            fallback = (meta, pack, False)
+    return fallback
+
+
+def parse_servings(recipe_text):
+    """Servings one batch of the recipe makes, e.g. 'Serves: 4' -> 4; None when not stated."""
+    match = SERVINGS_RE.search(recipe_text or "")
+    if not match:
+        return None
+    servings = int(match.group(1) or match.group(2))
+    return servings or None
+
+
+def required_quantity(ing, ingredient_lines, quantities=None):
+    # Structured (qty, unit) from recipe_ingredients first; the raw line is only parsed when they're NULL
+    qty, unit = (quantities or {}).get(ing, (None, None))
+    if qty is not None and unit is not None:
+        return qty, unit
+    return parse_quantity(ingredient_lines.get(ing, ""))
+
+
+def estimate_cost(ingredient_lines, ingredients_from_db, quantities=None, servings=None, max_batches=MAX_BATCHES):
+    """Computes the purchase plan and its cost per serving (or per recipe batch).
+
+    ingredient_lines maps each ingredient key to its raw recipe line;
+    ingredients_from_db maps the same keys to matched FairPrice products;
+    quantities optionally maps keys to the canonical (qty, unit) parsed at ingest time;
+    servings is how many servings one batch makes, if the recipe states it.
+    """
+    items = []
+    unpriced = []
+    for ing, products in ingredients_from_db.items():
+        required = required_quantity(ing, ingredient_lines, quantities)
+        meta, pack, comparable = choose_product(required, products)
+        if meta is None:
+            unpriced.append(ing)
+            continue
+        if not comparable:
+            required = None
+        items.append({
+            "ingredient": ing,
+            "product": meta['name'],
+            "url": meta.get('url', 'N/A'),
+            "price": float(meta['price']),
+            "size": meta.get('size'),
+            "pack_amount": pack[0],
+            # Ingredients without a comparable amount ('to taste') get one pack and don't limit batches
+            "required_amount": required[0] if required else None,
+            "unit": pack[1],
+        })
+
+    per = "serving" if servings else "recipe"
+    if not items:
+        return {"items": [], "unpriced": unpriced, "batches": 0, "per": per}
+
+    price = np.array([item["price"] for item in items])
+    pack = np.array([item["pack_amount"] for item in items])
+    limiting = np.array([item["required_amount"] is not None for item in items])
+    required = np.array([item["required_amount"] or 0.0 for item in items])
+
+    # Original plan: the minimum number of packs, and how many recipe batches that already covers
+    base_packs = np.maximum(np.where(limiting, np.ceil(required / pack), 1), 1)
+    batches = np.where(limiting, np.floor(base_packs * pack / np.where(limiting, required, 1)), np.inf)
+    base_batches = int(max(min(np.min(batches), max_batches), 1)) if np.isfinite(np.min(batches)) else 1
+    base_cost = float(base_packs @ price)
+    limiting_index = int(np.argmin(batches)) if np.isfinite(np.min(batches)) else None
+
+    # Optimized plan: buy more of the limiting ingredient only, up to the batches the
+    # other ingredients already cover; packs[t, i] = packs of i needed for targets[t] batches
+    if limiting_index is None:
+        ceiling = base_batches
+    else:
+        ceiling = int(min(np.min(np.delete(batches, limiting_index), initial=np.inf), max_batches))
+    targets = np.arange(base_batches, max(ceiling, base_batches) + 1)
+    packs = np.maximum(
+        base_packs[None, :],
+        np.where(limiting, np.ceil(targets[:, None] * required[None, :] / pack[None, :]), 1)
+    )
+    total_cost = packs @ price
+    cost_per_batch = total_cost / targets
+
+    best = int(np.argmin(cost_per_batch))
+    optimized_batches = int(targets[best])
+    optimized_packs = packs[best]
+
+    # Costs are divided by the servings the purchase makes (batches x servings per batch)
+    servings_per_batch = servings or 1
+    for i, item in enumerate(items):
+        item["packs"] = int(base_packs[i])
+        item["cost_per_unit"] = round(float(base_packs[i] * price[i]) / (base_batches * servings_per_batch), 2)
+        item["optimized_packs"] = int(optimized_packs[i])
+        item["optimized_cost_per_unit"] = round(
+            float(optimized_packs[i] * price[i]) / (optimized_batches * servings_per_batch), 2
+        )
+
+    return {
+        "items": items,
+        "unpriced": unpriced,
+        "per": per,
+        "servings": servings,
+        "limiting_ingredient": items[limiting_index]["ingredient"] if limiting_index is not None else None,
+        "total_cost": round(base_cost, 2),
+        "batches": base_batches,
+        "cost_per_unit": round(base_cost / (base_batches * servings_per_batch), 2),
+        "optimized_total_cost": round(float(total_cost[best]), 2),
+        "optimized_batches": optimized_batches,
+        "optimized_cost_per_unit": round(float(cost_per_batch[best]) / servings_per_batch, 2),
+    }
+
+
+def _yield(estimate, batches):
+    # "2 batches of the recipe (8 servings)" / "2 batch(es) of the recipe"
+    if estimate["servings"]:
+        return f"{batches} batch(es) of the recipe ({batches * estimate['servings']} servings)"
+    return f"{batches} batch(es) of the recipe"
+
+
+def render_cost_table(estimate):
+    """Renders the estimate as a markdown section."""
+    if not estimate["items"]:
+        return "No priced FairPrice products could be matched, so no cost estimate is available."
+    per = estimate["per"]
+    lines = [
+        f"| Ingredient | Product | Price | Size | Packs | Cost / {per} | Optimized packs | Optimized cost / {per} |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for item in estimate["items"]:
+        lines.append(
+            f"| {item['ingredient']} | [{item['product']}]({item['url']}) | ${item['price']:.2f} | {item['size']} "
+            f"| {item['packs']} | ${item['cost_per_unit']:.2f} | {item['optimized_packs']} "
+            f"| ${item['optimized_cost_per_unit']:.2f} |"
+        )
+    lines.append("")
+    lines.append(
+        f"- **Original purchase:** ${estimate['total_cost']:.2f} for {_yield(estimate, estimate['batches'])} "
+        f"= **${estimate['cost_per_unit']:.2f} per {per}**"
+    )
+    if estimate["optimized_cost_per_unit"] < estimate["cost_per_unit"]:
+        lines.append(
+            f"- **Optimized:** buying more of the limiting ingredient ({estimate['limiting_ingredient']}), "
+            f"${estimate['optimized_total_cost']:.2f} makes {_yield(estimate, estimate['optimized_batches'])} "
+            f"= **${estimate['optimized_cost_per_unit']:.2f} per {per}**"
+        )
+    else:
+        lines.append(f"- Buying more of the limiting ingredient does not lower the cost per {per}.")
+    if not estimate["servings"]:
+        lines.append("- The recipe doesn't state its servings, so costs are per recipe batch, not per serving.")
+    if estimate["unpriced"]:
+        lines.append(f"- Not priced (no matching product size/price): {', '.join(estimate['unpriced'])}")
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+import os
+from chromadb.utils import embedding_functions
+from embedding_cache import CachedEmbeddingFunction, cached_openai_ef
+
+# --- Embedding Backends ---
+# "openai": remote text-embedding-ada-002 (the original collections)
+# "local":  sentence-transformers on CPU, no network round-trip per query
+BACKENDS = {
+    "openai": "text-embedding-ada-002",
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+}
+DEFAULT_BACKEND = os.getenv("RAGCIPE_EMBEDDING_BACKEND", "openai")
+BACKEND_METADATA_KEY = "embedding_backend"
+
+
+def backend_tag(backend):
+    """Identifies the backend and model that produced a collection, e.g. 'openai:text-embedding-ada-002'."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {list(BACKENDS)}")
+    return f"{backend}:{BACKENDS[backend]}"
+
+
+def get_embedding_function(backend=DEFAULT_BACKEND, api_key=None):
+    backend_tag(backend)  # validates the name
+    model_name = BACKENDS[backend]
+    if backend == "openai":
+        return cached_openai_ef(api_key or os.getenv("OPENAI_API_KEY"), model_name=model_name)
+    local_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=model_name, device="cpu", normalize_embeddings=True
+    )
+    return CachedEmbeddingFunction(local_ef, model_name)
+
+
+def collection_name(base_name, backend=DEFAULT_BACKEND):
+    # The OpenAI collections keep their original names
+    return base_name if backend == "openai" else f"{base_name}_{backend}"
+
+
+def check_backend(collection, backend):
+    """Raises ValueError if the collection was embedded with a different backend."""
+    # Collections created before tagging existed were all embedded with OpenAI
+    tag = (collection.metadata or {}).get(BACKEND_METADATA_KEY, backend_tag("openai"))
+    if tag != backend_tag(backend):
+        raise ValueError(
+            f"Collection '{collection.name}' was embedded with '{tag}', "
+            f"but queries would use '{backend_tag(backend)}'. Re-embed it or switch backend."
+        )
+
+
+def get_collection(client, base_name, backend=DEFAULT_BACKEND, api_key=None, embedding_function=None):
+    """Opens the collection for this backend and verifies its backend tag.
+
+    embedding_function replaces the backend's own (e.g. a stand-in for tests);
+    it must produce vectors from the same model.
+    """
+    collection = client.get_collection(
+        collection_name(base_name, backend),
+        embedding_function=embedding_function or get_embedding_function(backend, api_key)
+    )
+    check_backend(collection, backend)
+    return collection
+
+
+def get_or_create_collection(client, base_name, backend=DEFAULT_BACKEND, api_key=None, reembed=False):
+    """Opens or creates a tagged collection for ingestion.
+
+    With reembed=True the existing collection for this backend is dropped first so
+    every document is embedded again by the selected backend.
+    """
+    name = collection_name(base_name, backend)
+    if reembed and name in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+        client.delete_collection(name)
+        print(f"🗑️ Dropped '{name}' for re-embedding.")
+    collection = client.get_or_create_collection(
+        name=name,
+        embedding_function=get_embedding_function(backend, api_key),
+        metadata={BACKEND_METADATA_KEY: backend_tag(backend)}
+    )
+    check_backend(collection, backend)
+    if BACKEND_METADATA_KEY not in (collection.metadata or {}):
+        # Tag legacy OpenAI collections in place
+        collection.modify(metadata={**(collection.metadata or {}), BACKEND_METADATA_KEY: backend_tag(backend)})
+    return collection
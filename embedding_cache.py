@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+import unicodedata
+import re
+from collections import OrderedDict
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils import embedding_functions
+
+import tracing
+
+# --- Settings ---
+CACHE_PATH = "embedding_cache.db"
+MAX_ENTRIES = 200_000       # on-disk bound, least recently used rows are evicted
+EVICT_TO = 0.9              # eviction trims to this fraction of MAX_ENTRIES, so it runs rarely
+MEMORY_ENTRIES = 10_000     # in-process LRU in front of SQLite
+TOUCH_FLUSH = 256           # hits are recorded for LRU eviction in batches
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Wraps a Chroma embedding function with a persistent (model, text hash) -> vector cache.
+
+    Hits are served from memory or SQLite; only the misses are sent to the wrapped
+    function, in a single batch.
+    """
+
+    def __init__(self, embedding_function, model_name, path=CACHE_PATH,
+                 max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._pending_touch = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        # Running row count (an upper bound: replaced keys and other processes' writes are
+        # only reconciled when it crosses max_entries), so stores don't scan the table
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                missing.append(key)
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[key] = vector
+                self._remember(key, vector)
+        return found
+
+    def _store(self, entries):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, embedding, last_used) VALUES (?, ?, ?, ?)",
+            [(key, self.model_name, vector.tobytes(), now) for key, vector in entries.items()]
+        )
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        self._count += len(entries)
+        self._flush_touches()
+        self._evict()
+        self._conn.commit()
+
+    def _touch(self, keys):
+        # Deferred so memory hits don't pay for a disk write
+        self._pending_touch.update(keys)
+        if len(self._pending_touch) >= TOUCH_FLUSH:
+            self._flush_touches()
+            self._conn.commit()
+
+    def _flush_touches(self):
+        if self._pending_touch:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self._pending_touch]
+            )
+            self._pending_touch.clear()
+
+    def _evict(self):
+        if self._count <= self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            keep = int(self.max_entries * EVICT_TO)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (count - keep,)
+            )
+            count = keep
+        self._count = count
+
+    def __call__(self, input):
+        texts = list(input)
+        keys = [cache_key(self.model_name, text) for text in texts]
+        with self._lock:
+            found = self._lookup(list(dict.fromkeys(keys)))
+
+        # Embed each distinct missing text once
+        miss_texts = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in miss_texts:
+                miss_texts[key] = text
+        if miss_texts:
+            with tracing.span("embedding", model=self.model_name, texts=len(miss_texts), cache_hits=len(found)):
+                vectors = self.embedding_function(list(miss_texts.values()))
+            new_entries = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(miss_texts.keys(), vectors)
+            }
+            with self._lock:
+                self._store(new_entries)
+            found.update(new_entries)
+
+        hit_keys = [key for key in dict.fromkeys(keys) if key not in miss_texts]
+        with self._lock:
+            self.hits += len(texts) - sum(1 for key in keys if key in miss_texts)
+            self.misses += len(miss_texts)
+            if hit_keys:
+                self._touch(hit_keys)
+        return [found[key] for key in keys]
+
+
+def endpoint_cache_path(path=CACHE_PATH, base_url=None):
+    """Cache file for an OpenAI endpoint: the default API uses `path`, any OPENAI_BASE_URL
+    (e.g. the openai_standin.py server) gets its own file so its vectors never mix with real ones."""
+    base_url = base_url if base_url is not None else os.getenv("OPENAI_BASE_URL")
+    if not base_url:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{hashlib.sha256(base_url.rstrip('/').encode('utf-8')).hexdigest()[:12]}{ext}"
+
+
+def cached_openai_ef(api_key, model_name="text-embedding-ada-002", path=CACHE_PATH):
+    """OpenAIEmbeddingFunction with the persistent embedding cache in front of it."""
+    path = endpoint_cache_path(path)
+    openai_ef = embedding_functions.OpenAIEmbeddingFunction(api_key=api_key, model_name=model_name)
+    return CachedEmbeddingFunction(openai_ef, model_name, path=path)
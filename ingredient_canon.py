@@ -0,0 +1,135 @@
+import re
+from cost_engine import UNIT_FACTORS
+
+# --- Ingredient Canonicalization ---
+# Reduces a raw recipe ingredient line to a canonical lookup key: quantities,
+# units, preparation words and brackets are stripped, plurals are folded and
+# local synonyms are mapped, so "2 cloves garlic, minced", "garlic (chopped)"
+# and "Garlic 3 cloves" all become "garlic", and beancurd meets tofu.
+#
+# Bump CANON_VERSION whenever the rules change; materialized lookups keyed on
+# the old form are rebuilt.
+
+CANON_VERSION = 1
+
+# Phrase -> canonical name. Matched on whole words after lowercasing and plural folding.
+SYNONYMS = {
+    "beancurd": "tofu",
+    "bean curd": "tofu",
+    "taukwa": "firm tofu",
+    "tau kwa": "firm tofu",
+    "tau foo": "tofu",
+    "chye sim": "choy sum",
+    "cai xin": "choy sum",
+    "chai sim": "choy sum",
+    "pak choy": "bok choy",
+    "bak choy": "bok choy",
+    "pak choi": "bok choy",
+    "kangkong": "water spinach",
+    "kang kong": "water spinach",
+    "dou miao": "pea shoot",
+    "dau miao": "pea shoot",
+    "brinjal": "eggplant",
+    "aubergine": "eggplant",
+    "lady finger": "okra",
+    "ladies finger": "okra",
+    "lady's finger": "okra",
+    "capsicum": "bell pepper",
+    "scallion": "spring onion",
+    "green onion": "spring onion",
+    "cilantro": "coriander",
+    "coriander leaf": "coriander",
+    "ikan bilis": "anchovy",
+    "soya sauce": "soy sauce",
+    "soya bean": "soybean",
+    "soy bean": "soybean",
+    "yoghurt": "yogurt",
+    "chili": "chilli",
+    "chile": "chilli",
+    "hae bee": "dried shrimp",
+    "bee hoon": "rice vermicelli",
+    "mee hoon": "rice vermicelli",
+    "kway teow": "flat rice noodle",
+    "hor fun": "flat rice noodle",
+}
+
+PREP_WORDS = {
+    "minced", "chopped", "sliced", "diced", "peeled", "deshelled", "shelled", "cleaned", "shredded",
+    "beaten", "segmented", "grated", "crushed", "cubed", "halved", "quartered", "deveined", "trimmed",
+    "rinsed", "drained", "strained", "soaked", "blanched", "julienned", "mashed", "pitted", "seeded",
+    "cored", "cut", "into", "finely", "roughly", "thinly", "coarsely", "lightly", "fresh", "freshly",
+    "optional", "taste", "to", "as", "needed", "garnish", "for", "and", "or", "of", "about", "each",
+    "large", "medium", "small", "whole", "pinch", "dash", "handful", "some", "a", "the", "strips", "strip",
+    "florets", "floret", "pieces", "piece", "cubes", "cube", "thick", "thin", "cooked", "uncooked",
+    "washed",
+}
+
+# Units that are also ingredients in their own right stay in the key
+UNIT_WORDS = set(UNIT_FACTORS) - {"egg", "eggs"}
+
+
+def _singular(word):
+    if len(word) <= 3 or word.endswith("ss"):
+        return word
+    if word == "leaves":
+        return "leaf"
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _apply_synonyms(text):
+    for phrase in sorted(SYNONYMS, key=len, reverse=True):
+        text = re.sub(rf"\b{re.escape(phrase)}\b", SYNONYMS[phrase], text)
+    return text
+
+
+def canonicalize(line):
+    """Returns the canonical lookup key for an ingredient line ('' if nothing is left)."""
+    text = line.lower().replace("’", "'")
+    text = re.sub(r"\(.*?\)|\[.*?\]", " ", text)   # bracketed notes
+    text = text.split(":")[-1] if ":" in text else text
+    text = _apply_synonyms(text)
+
+    # Keep the comma-separated segment that names the ingredient (the first one with a real word);
+    # of "x or y" alternatives the first is kept
+    best = ""
+    for segment in re.split(r"[,;]", text):
+        segment = re.split(r"\bor\b", segment)[0]
+        words = []
+        for word in re.findall(r"[a-z][a-z'\-]*", segment):
+            word = word.strip("'-")
+            if word in UNIT_WORDS or word in PREP_WORDS:
+                continue
+            words.append(_singular(word))
+        if words:
+            best = " ".join(words)
+            break
+    # Synonyms again after plural folding ("beancurds", "scallions")
+    return _apply_synonyms(best).strip()
+
+
+def corpus_report(db_path="recipes_clean.db", table="recipes"):
+    """Prints how many distinct lookup keys the corpus has before and after canonicalization."""
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"SELECT ingredients FROM {table}").fetchall()
+    conn.close()
+    raw_keys, canonical_keys = set(), set()
+    for (ingredients,) in rows:
+        for line in (ingredients or "").split("\n"):
+            if line.strip():
+                # The key extract_ingredients used before canonicalization
+                raw_keys.add(re.sub(r'[\d\*\(\),]+', '', line).strip().lower())
+                canonical_keys.add(canonicalize(line))
+    canonical_keys.discard("")
+    print(f"Distinct lookup keys: {len(raw_keys)} raw -> {len(canonical_keys)} canonical "
+          f"({len(raw_keys) / max(len(canonical_keys), 1):.1f}x fewer).")
+
+
+if __name__ == "__main__":
+    corpus_report()
@@ -0,0 +1,185 @@
+import sys
+try:
+    import pysqlite3  # This is the pip-installed "pysqlite3-binary" package
+    # Re-map the built-in "sqlite3" to "pysqlite3"
+    sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+except ImportError:
+    pass  # if pysqlite3 isn't found, fallback to system sqlite3
+
+import sqlite3
+import hashlib
+import json
+import time
+from ingredient_canon import CANON_VERSION
+from response_cache import invalidate_responses
+
+# --- Materialized Ingredient -> Product Matches ---
+# The recipe corpus is fixed, so product matching for every ingredient of every
+# recipe is done offline and stored here. Request handling then reads the rows by
+# recipe id instead of embedding and searching at request time.
+#
+# Build / refresh (incremental: only recipes whose text changed are re-matched,
+# everything is re-matched when the product catalogue changes):
+#     python ingredient_matches.py [--full]
+
+DB_PATH = "recipes_clean.db"
+TOP_K = 3
+
+
+def ensure_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingredient_matches (
+            recipe_id TEXT NOT NULL,
+            ingredient TEXT NOT NULL,
+            position INTEGER,
+            rank INTEGER NOT NULL,
+            product_id TEXT,
+            distance REAL,
+            name TEXT,
+            brand TEXT,
+            price REAL,
+            size TEXT,
+            url TEXT,
+            url_status TEXT,
+            url_checked_at REAL
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(ingredient_matches)")]
+    if "position" not in columns:
+        # Tables built before rows kept the recipe order: add the column and re-match everything
+        conn.execute("ALTER TABLE ingredient_matches ADD COLUMN position INTEGER")
+        conn.execute("DROP TABLE IF EXISTS ingredient_match_state")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingredient_matches_recipe ON ingredient_matches(recipe_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingredient_match_state (
+            recipe_id TEXT PRIMARY KEY,
+            document_hash TEXT NOT NULL,
+            products_fingerprint TEXT NOT NULL,
+            built_at REAL NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def load_ingredient_matches(recipe_id, db_path=DB_PATH):
+    """Returns {ingredient: [product, ...]} in recipe order for a recipe, or None if it hasn't been materialized.
+
+    Products have the same shape as search_ingredients_chroma results.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        state = conn.execute(
+            "SELECT 1 FROM ingredient_match_state WHERE recipe_id = ?", (str(recipe_id),)
+        ).fetchone()
+        if state is None:
+            return None
+        rows = conn.execute(
+            "SELECT ingredient, product_id, distance, name, brand, price, size, url, url_status, url_checked_at "
+            "FROM ingredient_matches WHERE recipe_id = ? ORDER BY position, rank",
+            (str(recipe_id),)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+    matches = {}
+    for ingredient, product_id, distance, name, brand, price, size, url, url_status, url_checked_at in rows:
+        products = matches.setdefault(ingredient, [])
+        if product_id is None:
+            continue  # placeholder row for an ingredient with no matches
+        products.append({
+            "id": product_id,
+            "metadata": {
+                "name": name, "brand": brand, "price": price, "size": size, "url": url,
+                "url_status": url_status, "url_checked_at": url_checked_at,
+            },
+            "document": None,
+            "similarity": distance,
+        })
+    return matches
+
+
+def products_fingerprint(ingredients_collection):
+    # Changes whenever products are added/removed or their price, size or link health changes
+    products = ingredients_collection.get(include=['metadatas'])
+    # Ingredient keys depend on the canonicalization rules, so their version is part of it too
+    digest = hashlib.sha256(f"canon:{CANON_VERSION}".encode("utf-8"))
+    for product_id, meta in sorted(zip(products['ids'], products['metadatas'])):
+        meta = meta or {}
+        digest.update(json.dumps(
+            [product_id, meta.get('price'), meta.get('size'), meta.get('url'), meta.get('url_status')]
+        ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_ingredient_matches(full=False, top_k=TOP_K, db_path=DB_PATH):
+    import Full_Prompt_new
+
+    recipes_collection = Full_Prompt_new.get_recipes_collection()
+    fingerprint = products_fingerprint(Full_Prompt_new.get_ingredients_collection())
+    recipes = recipes_collection.get(include=['documents'])
+
+    conn = sqlite3.connect(db_path)
+    ensure_tables(conn)
+    state = {
+        recipe_id: (document_hash, products_fp)
+        for recipe_id, document_hash, products_fp in conn.execute(
+            "SELECT recipe_id, document_hash, products_fingerprint FROM ingredient_match_state"
+        )
+    }
+
+    # Drop recipes that are no longer in the collection
+    current_ids = set(recipes['ids'])
+    removed = [recipe_id for recipe_id in state if recipe_id not in current_ids]
+    for recipe_id in removed:
+        conn.execute("DELETE FROM ingredient_matches WHERE recipe_id = ?", (recipe_id,))
+        conn.execute("DELETE FROM ingredient_match_state WHERE recipe_id = ?", (recipe_id,))
+
+    rebuilt = 0
+    for recipe_id, document in zip(recipes['ids'], recipes['documents']):
+        document_hash = hashlib.sha256(document.encode("utf-8")).hexdigest()
+        if not full and state.get(recipe_id) == (document_hash, fingerprint):
+            continue
+
+        ingredients = list(Full_Prompt_new.get_ingredient_lines(recipe_id, document))
+        matches = Full_Prompt_new.search_ingredients_chroma_batch(ingredients, desired=top_k)
+
+        rows = []
+        # position is the ingredient's place in the recipe, so loads keep the recipe order
+        for position, (ingredient, products) in enumerate(matches.items()):
+            if not products:
+                rows.append((recipe_id, ingredient, position, 0) + (None,) * 9)
+            for rank, prod in enumerate(products):
+                meta = prod['metadata']
+                rows.append((
+                    recipe_id, ingredient, position, rank, prod.get('id'), prod['similarity'],
+                    meta.get('name'), meta.get('brand'), meta.get('price'), meta.get('size'),
+                    meta.get('url'), meta.get('url_status'), meta.get('url_checked_at'),
+                ))
+
+        conn.execute("DELETE FROM ingredient_matches WHERE recipe_id = ?", (recipe_id,))
+        conn.executemany(
+            "INSERT INTO ingredient_matches (recipe_id, ingredient, position, rank, product_id, distance, name, "
+            "brand, price, size, url, url_status, url_checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ingredient_match_state (recipe_id, document_hash, products_fingerprint, built_at) "
+            "VALUES (?, ?, ?, ?)",
+            (recipe_id, document_hash, fingerprint, time.time())
+        )
+        conn.commit()
+        rebuilt += 1
+
+    conn.commit()
+    conn.close()
+    if rebuilt or removed:
+        # Cached answers may quote products or prices that have just changed
+        invalidate_responses()
+    print(f"✅ Ingredient matches: {rebuilt} recipes rebuilt, {len(removed)} removed, "
+          f"{len(current_ids) - rebuilt} up to date.")
+
+
+if __name__ == "__main__":
+    build_ingredient_matches(full="--full" in sys.argv)
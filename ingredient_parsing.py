@@ -0,0 +1,140 @@
+import sqlite3
+import re
+from cost_engine import parse_quantity
+from ingredient_canon import canonicalize
+from lexical_index import DB_PATH, SOURCE_TABLE
+
+# --- Structured Recipe Ingredients ---
+# Each recipe's `ingredients` text is parsed once at ingest time into ordered
+# (name, qty, unit) rows in the recipe_ingredients table, so request handling
+# reads rows by recipe id instead of regex-parsing the Chroma document.
+#
+# qty/unit are canonical (g, ml or count, see cost_engine); name is the
+# canonical lookup key (see ingredient_canon).
+
+# Words a wrapped continuation line typically starts with
+CONTINUATION_RE = re.compile(
+    r"^(?:and|or|with|into|removed|deveined|sliced|chopped|diced|cut|minced|peeled|seeded|cored|"
+    r"shelled|cleaned|finely|roughly|thinly|quartered|halved|trimmed|drained|soaked|as|for|to|"
+    r"including|which|of)\b",
+    re.IGNORECASE
+)
+# HealthHub's cleaner turned every "-" into ", " ("Low-fat" -> "Low, fat")
+HYPHEN_FIX_RE = re.compile(
+    r"\b(low|lower|all|reduced|whole|non|high|semi|extra|sugar|gluten|fat|salt|sodium|ready|free|"
+    r"half|multi|stir|deep|pan|sun|thick|wide|bite), (\w)",
+    re.IGNORECASE
+)
+SECTION_HEADER_RE = re.compile(r"^[A-Z][A-Z\s&]+:?$")
+# SHF items whose <li> tags were lost run together: "Almond flour, 30gUnsalted baked almonds, 35g"
+RUN_TOGETHER_RE = re.compile(r"(\d\s*(?:g|kg|ml|l|tsp|tbsp|cups?)?)(?=[A-Z][a-z])")
+
+
+def _join_continuations(lines):
+    joined = []
+    for line in lines:
+        if joined and (CONTINUATION_RE.match(line) or line[:1].islower()):
+            joined[-1] = f"{joined[-1]} {line}"
+        else:
+            joined.append(line)
+    return joined
+
+
+def parse_shf_ingredients(text):
+    """Singapore Heart Foundation format: one "Name, prep, qty" item per line."""
+    text = RUN_TOGETHER_RE.sub("\\1\n", text or "")
+    lines = [line.strip().strip("*").strip() for line in text.split("\n")]
+    lines = [line for line in lines if line and not SECTION_HEADER_RE.match(line)]
+    return _join_continuations(lines)
+
+
+def parse_healthhub_ingredients(text):
+    """HealthHub PDF format: bullet text with wrapped lines and dashes turned into commas."""
+    lines = []
+    for line in (text or "").split("\n"):
+        line = re.sub(r"^[•\-•\*]\s*", "", line.strip()).strip()
+        line = re.sub(r"\s+", " ", line)
+        if not line or SECTION_HEADER_RE.match(line):
+            continue
+        lines.append(HYPHEN_FIX_RE.sub(r"\1-\2", line))
+    return _join_continuations(lines)
+
+
+def parse_ingredients(text, url=""):
+    """Splits a recipe's ingredients text into item lines using the parser for its source."""
+    if "healthhub" in (url or ""):
+        return parse_healthhub_ingredients(text)
+    return parse_shf_ingredients(text)
+
+
+def _quantity(line):
+    # Bracketed notes and percentages ("100% wholegrain", "(1 tbsp for poaching)") aren't the amount
+    return parse_quantity(re.sub(r"\(.*?\)|\d+(?:\.\d+)?\s*%", " ", line))
+
+
+def structure_ingredients(text, url=""):
+    """Returns [(position, raw, name, qty, unit)] for a recipe's ingredients text."""
+    rows = []
+    seen = set()
+    for line in parse_ingredients(text, url):
+        name = canonicalize(line)
+        # Nested <li> tags repeat items verbatim
+        if not name or line in seen:
+            continue
+        seen.add(line)
+        quantity = _quantity(line)
+        qty, unit = quantity if quantity else (None, None)
+        rows.append((len(rows), line, name, qty, unit))
+    return rows
+
+
+def build_recipe_ingredients(db_path=DB_PATH, table=SOURCE_TABLE):
+    """(Re)builds the recipe_ingredients table from the recipe table."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("DROP TABLE IF EXISTS recipe_ingredients")
+    conn.execute("""
+        CREATE TABLE recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            raw TEXT NOT NULL,
+            name TEXT NOT NULL,
+            qty REAL,
+            unit TEXT,
+            PRIMARY KEY (recipe_id, position)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_recipe_ingredients_name ON recipe_ingredients(name)")
+
+    rows = []
+    for recipe_id, ingredients, url in conn.execute(f"SELECT id, ingredients, url FROM {table} WHERE id IS NOT NULL"):
+        rows += [(recipe_id,) + row for row in structure_ingredients(ingredients, url)]
+    conn.executemany(
+        "INSERT INTO recipe_ingredients (recipe_id, position, raw, name, qty, unit) VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    recipes = conn.execute("SELECT COUNT(DISTINCT recipe_id) FROM recipe_ingredients").fetchone()[0]
+    conn.close()
+    print(f"✅ {len(rows)} structured ingredients stored for {recipes} recipes.")
+
+
+def load_recipe_ingredients(recipe_id, db_path=DB_PATH):
+    """Returns the recipe's ingredient rows as dicts in recipe order ([] if none are stored)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT position, raw, name, qty, unit FROM recipe_ingredients WHERE recipe_id = ? ORDER BY position",
+            (int(recipe_id),)
+        ).fetchall()
+    except (sqlite3.OperationalError, ValueError):
+        return []
+    finally:
+        conn.close()
+    return [
+        {"position": position, "raw": raw, "name": name, "qty": qty, "unit": unit}
+        for position, raw, name, qty, unit in rows
+    ]
+
+
+if __name__ == "__main__":
+    build_recipe_ingredients()
@@ -1,26 +1,33 @@
 import chromadb
-from chromadb.utils import embedding_functions
 import sqlite3
 import os
+import sys
+from embedding_backends import DEFAULT_BACKEND, get_or_create_collection
+from link_health import ensure_link_columns
+from response_cache import invalidate_responses
+
+# Usage: python ingredients_embeddings.py [openai|local] [--reembed]
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+backend = args[0] if args else DEFAULT_BACKEND
+reembed = "--reembed" in sys.argv
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=openai_api_key, model_name="text-embedding-ada-002"
-)
 
-# ChromaDB client setup
+# ChromaDB client setup (collection is tagged with the embedding backend)
 client = chromadb.PersistentClient(path="fairprice_openai_embeddings_db")
-product_collection = client.get_or_create_collection(
-    "fairprice_products_openai", embedding_function=openai_ef
+product_collection = get_or_create_collection(
+    client, "fairprice_products_openai", backend, openai_api_key, reembed=reembed
 )
 
 # Load selected data from SQLite
 conn = sqlite3.connect("ingredient_chroma_db/fairprice_items.db")
+ensure_link_columns(conn)
 cursor = conn.cursor()
 
 cursor.execute("""
     SELECT id, name, brand, category, key_information, additional_information, 
-           ingredients, dietary, origin, nutritional_data, price, size, ratings, url
+           ingredients, dietary, origin, nutritional_data, price, size, ratings, url,
+           url_status, url_checked_at
     FROM products
 """)
 
@@ -30,7 +37,8 @@ products = cursor.fetchall()
 # Embed with ideal semantic fields, handling None clearly
 for product in products:
     (pid, name, brand, category, key_info, add_info, 
-     ingredients, dietary, origin, nutrition, price, size, ratings, url) = product
+     ingredients, dietary, origin, nutrition, price, size, ratings, url,
+     url_status, url_checked_at) = product
 
     # Replace None clearly for embeddings
     name = name or ""
@@ -56,7 +64,10 @@ for product in products:
         "price": price if price is not None else -1,
         "size": size or "Not specified",
         "ratings": ratings if ratings is not None else -1,
-        "url": url or ""
+        "url": url or "",
+        # Last result from link_health.py, kept across re-embeds
+        "url_status": url_status or "unchecked",
+        "url_checked_at": url_checked_at or 0
     }
 
     product_collection.add(
@@ -65,4 +76,7 @@ for product in products:
         metadatas=[metadata]
     )
 
+# Product prices may have changed, so cached recipe responses are stale
+invalidate_responses()
+
 print("✅ Successfully embedded products with metadata clearly handling None values.")
@@ -0,0 +1,120 @@
+import sqlite3
+import re
+from ingredient_canon import SYNONYMS
+from tracing import traced
+
+# --- Lexical (BM25) Recipe Index ---
+# SQLite FTS5 index over recipe name, ingredients and method, built next to the
+# Chroma index so exact-term queries ("tofu", "beancurd", ingredient names) are
+# not left to dense similarity alone.
+
+DB_PATH = "recipes_clean.db"
+# full_pipeline.embed_recipes embeds the `recipes` table, so its ids are the
+# Chroma recipes_collection ids that the lexical results get fused with.
+SOURCE_TABLE = "recipes"
+FTS_TABLE = "recipes_fts"
+RRF_K = 60
+
+# Query words left out of the MATCH expression: English stopwords, words that describe
+# any recipe ("dish", "meal") and nutrition/price qualifiers, which the nutrition
+# pre-filter handles. As OR-ed terms they would dominate BM25 and dilute the fusion.
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from", "get", "i",
+    "in", "into", "is", "it", "me", "my", "no", "not", "of", "on", "or", "some", "something", "that", "the",
+    "this", "to", "under", "up", "using", "want", "we", "what", "which", "with", "without", "you",
+}
+GENERIC_WORDS = {
+    "dish", "dishes", "meal", "meals", "recipe", "recipes", "food", "foods", "idea", "ideas", "option",
+    "options", "healthy", "easy", "simple", "quick", "cheap", "budget", "friendly", "high", "low", "rich",
+    "free", "less", "more", "than", "calorie", "calories", "kcal", "protein", "carb", "carbs", "fat",
+    "sodium", "fibre", "fiber", "sugar",
+}
+
+
+def build_fts_index(db_path=DB_PATH, table=SOURCE_TABLE):
+    """(Re)builds the FTS5 table from the recipe table."""
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            name, ingredients, method,
+            tokenize = 'porter unicode61'
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO {FTS_TABLE} (rowid, name, ingredients, method)
+        SELECT id, IFNULL(name, ''), IFNULL(ingredients, ''), IFNULL(method, '')
+        FROM {table}
+        WHERE id IS NOT NULL
+    """)
+    conn.commit()
+    count = conn.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}").fetchone()[0]
+    conn.close()
+    print(f"✅ FTS5 index built over {count} recipes.")
+
+
+def expand_synonyms(text):
+    # Local synonyms in both directions, so "tofu" also finds "beancurd" recipes and vice versa
+    text = text.lower()
+    phrases = []
+    for phrase, canonical in SYNONYMS.items():
+        if re.search(rf"\b{re.escape(phrase)}\b", text):
+            phrases.append(canonical)
+        if re.search(rf"\b{re.escape(canonical)}\b", text):
+            phrases.append(phrase)
+    return list(dict.fromkeys(phrases))
+
+
+def to_match_query(text):
+    # Quote each term so user punctuation can't break FTS5 syntax; any term may match
+    terms = [
+        term for term in re.findall(r"\w+", text.lower())
+        if term not in STOPWORDS and term not in GENERIC_WORDS and not term.isdigit()
+    ]
+    phrases = [" ".join(re.findall(r"\w+", phrase)) for phrase in expand_synonyms(text)]
+    return " OR ".join(f'"{term}"' for term in terms + phrases if term)
+
+
+@traced("lexical_search")
+def search_recipes_fts(query_text, limit=20, db_path=DB_PATH, allowed_ids=None):
+    """Returns recipe ids (as strings) ranked by BM25, best first.
+
+    allowed_ids optionally restricts the search to a pre-filtered candidate set.
+    """
+    match_query = to_match_query(query_text)
+    if not match_query:
+        return []
+    id_clause = ""
+    params = [match_query]
+    if allowed_ids is not None:
+        if not allowed_ids:
+            return []
+        id_clause = f" AND rowid IN ({','.join('?' * len(allowed_ids))})"
+        params += [int(recipe_id) for recipe_id in allowed_ids]
+    conn = sqlite3.connect(db_path)
+    try:
+        # Name matches weigh more than ingredient matches, which weigh more than method text
+        rows = conn.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?{id_clause} "
+            f"ORDER BY bm25({FTS_TABLE}, 5.0, 2.0, 1.0) LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"Lexical search unavailable ({e}); run build_fts_index().")
+        return []
+    finally:
+        conn.close()
+    return [str(row[0]) for row in rows]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merges several ranked id lists into one, scoring each id by sum(1 / (k + rank))."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+if __name__ == "__main__":
+    build_fts_index()
@@ -0,0 +1,116 @@
+import sys
+try:
+    import pysqlite3  # This is the pip-installed "pysqlite3-binary" package
+    # Re-map the built-in "sqlite3" to "pysqlite3"
+    sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+except ImportError:
+    pass  # if pysqlite3 isn't found, fallback to system sqlite3
+
+import chromadb
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from embedding_backends import BACKENDS, collection_name, get_collection
+from url_validator import check_url, store_results
+from response_cache import invalidate_responses
+
+# Offline link-health stage: run after ingredients_embeddings.py (and periodically)
+# so request handling can filter dead product links with a Chroma `where` clause.
+
+PRODUCTS_DB = "ingredient_chroma_db/fairprice_items.db"
+CHROMA_PATH = "fairprice_openai_embeddings_db"
+PRODUCTS_COLLECTION = "fairprice_products_openai"  # base name, see embedding_backends.collection_name
+MAX_WORKERS = 16
+BATCH_SIZE = 200
+
+
+def ensure_link_columns(conn):
+    """Adds url_status / url_checked_at to the products table if missing."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+    if "url_status" not in columns:
+        conn.execute("ALTER TABLE products ADD COLUMN url_status TEXT DEFAULT 'unchecked'")
+    if "url_checked_at" not in columns:
+        conn.execute("ALTER TABLE products ADD COLUMN url_checked_at REAL DEFAULT 0")
+    conn.commit()
+
+
+def check_products(products):
+    """Runs HEAD checks for [(id, url)] concurrently, returns [(id, url, status, checked_at)]."""
+    def check(item):
+        pid, url = item
+        status = "ok" if url and check_url(url) else "dead"
+        return pid, url, status, time.time()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return list(executor.map(check, products))
+
+
+def product_collections(client):
+    """Opens the product collection of every embedding backend that has been ingested."""
+    existing = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+    return [
+        get_collection(client, PRODUCTS_COLLECTION, backend)
+        for backend in BACKENDS
+        if collection_name(PRODUCTS_COLLECTION, backend) in existing
+    ]
+
+
+def update_link_health(max_age=None):
+    """Checks product links and records the result in SQLite and Chroma metadata.
+
+    If max_age (seconds) is given, only products checked longer ago than that are re-checked.
+    """
+    load_dotenv()
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    # Each backend keeps its own copy of the product metadata, so all of them are updated
+    collections = product_collections(client)
+
+    conn = sqlite3.connect(PRODUCTS_DB)
+    ensure_link_columns(conn)
+    if max_age is None:
+        products = conn.execute("SELECT id, url FROM products").fetchall()
+    else:
+        products = conn.execute(
+            "SELECT id, url FROM products WHERE url_checked_at IS NULL OR url_checked_at < ?",
+            (time.time() - max_age,)
+        ).fetchall()
+
+    dead = 0
+    for start in range(0, len(products), BATCH_SIZE):
+        results = check_products(products[start:start + BATCH_SIZE])
+
+        conn.executemany(
+            "UPDATE products SET url_status = ?, url_checked_at = ? WHERE id = ?",
+            [(status, checked_at, pid) for pid, _, status, checked_at in results]
+        )
+        conn.commit()
+
+        # Merge link health into the existing Chroma metadata (no re-embedding)
+        ids = [str(pid) for pid, _, _, _ in results]
+        health = {str(pid): (status, checked_at) for pid, _, status, checked_at in results}
+        for collection in collections:
+            existing = collection.get(ids=ids, include=['metadatas'])
+            metadatas = []
+            for pid, meta in zip(existing['ids'], existing['metadatas']):
+                status, checked_at = health[pid]
+                metadatas.append({**(meta or {}), "url_status": status, "url_checked_at": checked_at})
+            if metadatas:
+                collection.update(ids=existing['ids'], metadatas=metadatas)
+
+        # Warm the request-time URL cache as well
+        store_results({url: status == "ok" for _, url, status, _ in results if url})
+
+        dead += sum(1 for _, _, status, _ in results if status == "dead")
+        print(f"✅ Checked {min(start + BATCH_SIZE, len(products))}/{len(products)} product links.")
+
+    conn.close()
+    # Cached answers may list links that are now dead
+    invalidate_responses()
+    print(f"✅ Link health updated: {len(products) - dead} ok, {dead} dead.")
+
+
+if __name__ == "__main__":
+    # Usage: python link_health.py [max_age_hours]
+    max_age_hours = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    update_link_health(max_age=max_age_hours * 3600 if max_age_hours is not None else None)
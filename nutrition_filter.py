@@ -0,0 +1,116 @@
+import sqlite3
+import re
+from lexical_index import DB_PATH, SOURCE_TABLE
+
+# --- Nutrition Constraint Pre-filter ---
+# Turns phrases like "high protein" or "under 400 calories" into numeric predicates
+# over the recipe table, resolved to a candidate id set with indexed SQL before
+# the vector search runs.
+
+NUTRIENT_COLUMNS = ["calories", "protein", "fat", "cholesterol", "carbohydrates", "fibre", "sodium"]
+
+# Words that refer to each column (units are per serving, as scraped)
+NUTRIENT_WORDS = {
+    "calories": r"(?:kcal|calories|calorie|cals?)",
+    "protein": r"(?:g\s+(?:of\s+)?)?protein",
+    "fat": r"(?:g\s+(?:of\s+)?)?fat",
+    "cholesterol": r"(?:mg\s+(?:of\s+)?)?cholesterol",
+    "carbohydrates": r"(?:g\s+(?:of\s+)?)?(?:carbs?|carbohydrates?)",
+    "fibre": r"(?:g\s+(?:of\s+)?)?(?:fibre|fiber)",
+    "sodium": r"(?:mg\s+(?:of\s+)?)?(?:sodium|salt)",
+}
+
+# Thresholds for qualitative phrases
+QUALITATIVE = {
+    r"\bhigh[\s-]protein\b|\bprotein[\s-]rich\b": ("protein", ">=", 20),
+    r"\blow[\s-](?:calorie|cal|kcal)s?\b": ("calories", "<=", 400),
+    r"\blow[\s-]fat\b": ("fat", "<=", 10),
+    r"\blow[\s-]carbs?\b|\bketo\b": ("carbohydrates", "<=", 30),
+    r"\blow[\s-](?:sodium|salt)\b": ("sodium", "<=", 600),
+    r"\blow[\s-]cholesterol\b": ("cholesterol", "<=", 100),
+    r"\bhigh[\s-](?:fibre|fiber)\b|\b(?:fibre|fiber)[\s-]rich\b": ("fibre", ">=", 5),
+}
+
+UPPER_WORDS = r"(?:under|below|less than|at most|max(?:imum)?|no more than|<=?)"
+LOWER_WORDS = r"(?:over|above|more than|at least|min(?:imum)?|>=?)"
+NUMBER = r"(\d+(?:\.\d+)?)"
+
+
+def parse_constraints(query_text):
+    """Returns [(column, op, value)] predicates found in the query."""
+    text = query_text.lower()
+    constraints = {}
+    for pattern, constraint in QUALITATIVE.items():
+        if re.search(pattern, text):
+            constraints[(constraint[0], constraint[1])] = constraint[2]
+
+    for column, word in NUTRIENT_WORDS.items():
+        for op, bound_words in (("<=", UPPER_WORDS), (">=", LOWER_WORDS)):
+            # "under 400 calories", "at least 20g protein"
+            match = re.search(rf"{bound_words}\s*{NUMBER}\s*{word}\b", text)
+            # "protein over 20g", "calories under 400"
+            if not match:
+                match = re.search(rf"\b{word}\s+{bound_words}\s*{NUMBER}", text)
+            if match:
+                constraints[(column, op)] = float(match.group(1))
+    return [(column, op, value) for (column, op), value in constraints.items()]
+
+
+def ensure_indexes(db_path=DB_PATH, table=SOURCE_TABLE):
+    conn = sqlite3.connect(db_path)
+    for column in NUTRIENT_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+    conn.commit()
+    conn.close()
+
+
+def candidate_ids(constraints, db_path=DB_PATH, table=SOURCE_TABLE):
+    """Resolves predicates to the ids (as strings) of recipes that satisfy all of them."""
+    clauses = []
+    params = []
+    for column, op, value in constraints:
+        if column not in NUTRIENT_COLUMNS or op not in ("<=", ">="):
+            raise ValueError(f"Unsupported constraint: {column} {op} {value}")
+        clauses.append(f"{column} {op} ?")
+        params.append(value)
+    sql = f"SELECT id FROM {table} WHERE id IS NOT NULL"
+    if clauses:
+        sql += " AND " + " AND ".join(clauses)
+    conn = sqlite3.connect(db_path)
+    try:
+        return [str(row[0]) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def chroma_id_filter(ids):
+    """Chroma `where` clause restricting a query to the given recipe ids."""
+    return {"recipe_id": {"$in": [int(recipe_id) for recipe_id in ids]}}
+
+
+def has_recipe_ids(collection):
+    """Whether the collection carries the recipe_id metadata chroma_id_filter matches on."""
+    sample = collection.get(limit=1, include=['metadatas'])
+    return bool(sample['metadatas']) and (sample['metadatas'][0] or {}).get('recipe_id') is not None
+
+
+def tag_recipe_ids(collection):
+    """Offline step: adds the integer recipe_id metadata that chroma_id_filter matches on
+    to every recipe that lacks it (no re-embedding). Returns the number of recipes tagged.
+
+    Without the tag, every nutrition-constrained query would get no vector candidates.
+    """
+    existing = collection.get(include=['metadatas'])
+    untagged = [
+        (recipe_id, {**(meta or {}), 'recipe_id': int(recipe_id)})
+        for recipe_id, meta in zip(existing['ids'], existing['metadatas'])
+        if (meta or {}).get('recipe_id') is None
+    ]
+    if untagged:
+        collection.update(ids=[i for i, _ in untagged], metadatas=[m for _, m in untagged])
+    return len(untagged)
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    print(f"✅ Nutrition indexes created on {SOURCE_TABLE}.")
@@ -0,0 +1,134 @@
+import os
+import sys
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+# ONNX Runtime backend for the ms-marco cross-encoder, so reranking doesn't need torch.
+#
+# Export once (needs torch/transformers, run after download_encoder.py):
+#     python onnx_reranker.py export [--no-quantize]
+# Check that it ranks like the PyTorch CrossEncoder on the evaluation prompts:
+#     python onnx_reranker.py parity
+
+MODEL_DIR = "./cross_encoder_model"
+ONNX_PATH = os.path.join(MODEL_DIR, "model.onnx")
+QUANTIZED_PATH = os.path.join(MODEL_DIR, "model.int8.onnx")
+MAX_LENGTH = 512
+
+
+def export_onnx(model_dir=MODEL_DIR, onnx_path=ONNX_PATH, quantize=True):
+    """Exports the saved cross-encoder to ONNX, optionally with dynamic int8 quantization."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model.eval()
+
+    sample = tokenizer(["query"], ["document"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    print(f"✅ Exported ONNX model to {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(os.path.dirname(onnx_path), os.path.basename(QUANTIZED_PATH))
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"✅ Quantized (int8) model saved to {quantized_path}")
+
+
+class OnnxCrossEncoder:
+    """Drop-in for CrossEncoder.predict backed by ONNX Runtime and the fast tokenizer.
+
+    Like CrossEncoder with a single label, scores are sigmoid(logit) in [0, 1].
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, quantized=True, max_length=MAX_LENGTH):
+        model_path = QUANTIZED_PATH if quantized and os.path.exists(QUANTIZED_PATH) else ONNX_PATH
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found. Run `python onnx_reranker.py export` first."
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_path = model_path
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def predict(self, pairs, batch_size=32):
+        pairs = [(str(query), str(doc)) for query, doc in pairs]
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            encodings = self.tokenizer.encode_batch(pairs[start:start + batch_size])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+            logits = self.session.run(["logits"], inputs)[0]
+            if logits.shape[1] == 1:
+                scores.append(1 / (1 + np.exp(-logits[:, 0])))
+            else:
+                scores.append(logits)  # CrossEncoder applies no activation to multi-label outputs
+        return np.concatenate(scores) if scores else np.array([], dtype=np.float32)
+
+
+def check_parity(quantized=True, top_k=5):
+    """Compares top-k ordering against the PyTorch CrossEncoder on the evaluation prompts."""
+    import sqlite3
+    import pandas as pd
+    from sentence_transformers import CrossEncoder
+
+    eval_df = pd.read_csv("Evaluation_Recipes/Evaluation_Dataset_Recipes.csv")
+    conn = sqlite3.connect("recipes_clean.db")
+    recipes = pd.read_sql_query("SELECT name, ingredients, method, nutritional_data FROM recipes_clean", conn)
+    conn.close()
+    documents = (
+        "Recipe Name: " + recipes['name'].fillna('') + "\n"
+        "Ingredients: " + recipes['ingredients'].fillna('') + "\n"
+        "Method: " + recipes['method'].fillna('') + "\n"
+        "Nutritional Info: " + recipes['nutritional_data'].fillna('')
+    ).tolist()
+
+    torch_model = CrossEncoder(MODEL_DIR)
+    onnx_model = OnnxCrossEncoder(quantized=quantized)
+
+    mismatches = 0
+    for prompt in eval_df['prompt']:
+        pairs = [(prompt, doc) for doc in documents]
+        torch_top = list(np.argsort(-torch_model.predict(pairs))[:top_k])
+        onnx_top = list(np.argsort(-onnx_model.predict(pairs))[:top_k])
+        if torch_top != onnx_top:
+            mismatches += 1
+            print(f"⚠️ Ordering differs for '{prompt}': torch={torch_top} onnx={onnx_top}")
+
+    print(f"✅ {len(eval_df) - mismatches}/{len(eval_df)} prompts have identical top-{top_k} ordering "
+          f"({onnx_model.model_path}).")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "export":
+        export_onnx(quantize="--no-quantize" not in sys.argv)
+    elif command == "parity":
+        sys.exit(0 if check_parity(quantized="--fp32" not in sys.argv) else 1)
+    else:
+        print("Usage: python onnx_reranker.py [export [--no-quantize] | parity [--fp32]]")
@@ -0,0 +1,361 @@
+import sys
+try:
+    import pysqlite3  # This is the pip-installed "pysqlite3-binary" package
+    # Re-map the built-in "sqlite3" to "pysqlite3"
+    sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+except ImportError:
+    pass  # if pysqlite3 isn't found, fallback to system sqlite3
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import httpx
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+# --- OpenAI Record/Replay Stand-in ---
+# Serves /v1/embeddings and /v1/chat/completions (including streaming) from a
+# cassette store, so load tests and benchmarks run deterministically and offline.
+#
+# Modes:
+#   record  forwards each request to the real API and stores the result
+#   replay  serves stored results with synthetic latency; misses are a 404, or
+#           deterministic synthetic results with RAGCIPE_STANDIN_MISSES=synthetic
+#
+# Plug in either way:
+#   - base URL: `python openai_standin.py replay --port 8100`, then run anything with
+#     OPENAI_BASE_URL=http://localhost:8100/v1 (the OpenAI SDK, and Chroma's
+#     OpenAIEmbeddingFunction through it, honour this)
+#   - dependency injection, in-process: `openai_standin.install(StandIn("replay"))`
+#     before using Full_Prompt_new
+
+CASSETTE_PATH = os.getenv("RAGCIPE_CASSETTE_PATH", "openai_cassettes.db")
+UPSTREAM_URL = "https://api.openai.com/v1"
+MISS_POLICY = os.getenv("RAGCIPE_STANDIN_MISSES", "error")  # "error" or "synthetic"
+
+# Synthetic latency (replay mode)
+EMBEDDING_LATENCY_MS = float(os.getenv("RAGCIPE_STANDIN_EMBEDDING_MS", "80"))
+CHAT_FIRST_TOKEN_MS = float(os.getenv("RAGCIPE_STANDIN_FIRST_TOKEN_MS", "500"))
+CHAT_TOKEN_MS = float(os.getenv("RAGCIPE_STANDIN_TOKEN_MS", "15"))
+
+EMBEDDING_DIMENSIONS = {"text-embedding-ada-002": 1536}
+
+
+def _key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """SQLite store of embedding vectors (per model and text) and chat completions (per request)."""
+
+    def __init__(self, path=CASSETTE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB, recorded_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat (key TEXT PRIMARY KEY, model TEXT, content TEXT, usage TEXT, recorded_at REAL)"
+        )
+        self._conn.commit()
+
+    def get_vectors(self, model, texts):
+        keys = [_key(model, text) for text in texts]
+        with self._lock:
+            rows = dict(self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()) if keys else {}
+        return [np.frombuffer(rows[key], dtype=np.float32) if key in rows else None for key in keys]
+
+    def put_vectors(self, model, texts, vectors):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, recorded_at) VALUES (?, ?, ?, ?)",
+                [(_key(model, text), model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                 for text, vector in zip(texts, vectors)]
+            )
+            self._conn.commit()
+
+    def get_chat(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT content, usage FROM chat WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put_chat(self, key, model, content, usage):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat (key, model, content, usage, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, json.dumps(usage), time.time())
+            )
+            self._conn.commit()
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def synthetic_vector(model, text):
+    # Deterministic unit vector seeded by the text, so identical texts stay identical
+    seed = int(_key(model, text)[:16], 16)
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS.get(model, 1536)).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def chat_key(body):
+    # The same completion serves streaming and non-streaming requests
+    return _key(body.get("model"), body.get("messages"), body.get("temperature"))
+
+
+class StandIn:
+    """The request handling shared by the HTTP server and the in-process transports."""
+
+    def __init__(self, mode="replay", store=None, miss_policy=MISS_POLICY, embedding_ms=EMBEDDING_LATENCY_MS,
+                 first_token_ms=CHAT_FIRST_TOKEN_MS, token_ms=CHAT_TOKEN_MS, api_key=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown stand-in mode '{mode}', expected 'record' or 'replay'")
+        self.mode = mode
+        self.store = store or CassetteStore()
+        self.miss_policy = miss_policy
+        self.embedding_ms = embedding_ms
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self._upstream = None
+        if mode == "record":
+            self._upstream = httpx.Client(
+                base_url=UPSTREAM_URL, timeout=120.0,
+                headers={"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"}
+            )
+
+    # --- Embeddings ---
+    def embeddings(self, body):
+        model = body["model"]
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        vectors = self.store.get_vectors(model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            if self.mode == "record":
+                response = self._upstream.post("/embeddings", json={"model": model, "input": [texts[i] for i in missing]})
+                response.raise_for_status()
+                fetched = [item["embedding"] for item in sorted(response.json()["data"], key=lambda d: d["index"])]
+                self.store.put_vectors(model, [texts[i] for i in missing], fetched)
+                for i, vector in zip(missing, fetched):
+                    vectors[i] = np.asarray(vector, dtype=np.float32)
+            elif self.miss_policy == "synthetic":
+                for i in missing:
+                    vectors[i] = synthetic_vector(model, texts[i])
+            else:
+                raise CassetteMiss(f"No recorded embedding for {len(missing)} of {len(texts)} inputs")
+
+        encode_base64 = body.get("encoding_format") == "base64"
+        tokens = sum(len(text) // 4 + 1 for text in texts)
+        return {
+            "object": "list",
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+                    if encode_base64 else vector.tolist(),
+                }
+                for i, vector in enumerate(vectors)
+            ],
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    # --- Chat completions ---
+    def chat(self, body):
+        """Returns (content, usage) for a chat request."""
+        key = chat_key(body)
+        cached = self.store.get_chat(key)
+        if cached is not None:
+            return cached
+        if self.mode == "record":
+            response = self._upstream.post("/chat/completions", json={**body, "stream": False})
+            response.raise_for_status()
+            data = response.json()
+            content, usage = data["choices"][0]["message"]["content"], data.get("usage", {})
+            self.store.put_chat(key, body.get("model"), content, usage)
+            return content, usage
+        if self.miss_policy == "synthetic":
+            content = "Synthetic stand-in response. " * 40
+            return content, {"prompt_tokens": 0, "completion_tokens": 200, "total_tokens": 200}
+        raise CassetteMiss("No recorded chat completion for this request")
+
+    def chat_completion(self, body, content, usage):
+        return {
+            "id": f"chatcmpl-standin-{chat_key(body)[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def chat_events(self, body, content):
+        """SSE lines of a streamed completion, paired with the delay before each."""
+        base = {"id": f"chatcmpl-standin-{chat_key(body)[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model")}
+        pieces = re.findall(r"\S*\s*", content)
+        events = [(self.first_token_ms, {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                                              "finish_reason": None}]})]
+        events += [(self.token_ms, {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+                   for piece in pieces if piece]
+        events.append((0, {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        lines = [(delay, f"data: {json.dumps(event)}\n\n".encode("utf-8")) for delay, event in events]
+        return lines + [(0, b"data: [DONE]\n\n")]
+
+    def latency_ms(self, path, body):
+        # Non-streaming latency: embeddings are flat, chat is first token plus every further token
+        if self.mode == "record":
+            return 0
+        if path.endswith("/embeddings"):
+            return self.embedding_ms
+        return self.first_token_ms + self.token_ms * len(re.findall(r"\S+", self.chat(body)[0]))
+
+    def respond(self, path, body):
+        """Returns (status, json body) or (200, [(delay_ms, sse line), ...]) for streaming chat."""
+        try:
+            if path.endswith("/embeddings"):
+                return 200, self.embeddings(body)
+            if path.endswith("/chat/completions"):
+                content, usage = self.chat(body)
+                if body.get("stream"):
+                    return 200, self.chat_events(body, content) if self.mode == "replay" else [
+                        (0, line) for _, line in self.chat_events(body, content)
+                    ]
+                return 200, self.chat_completion(body, content, usage)
+        except CassetteMiss as e:
+            return 404, {"error": {"message": str(e), "type": "cassette_miss"}}
+        return 404, {"error": {"message": f"Unsupported endpoint {path}", "type": "invalid_request_error"}}
+
+
+# --- In-process transports (dependency injection) ---
+
+def _json_response(status, payload):
+    return httpx.Response(status, json=payload)
+
+
+def sync_transport(standin):
+    def handler(request):
+        body = json.loads(request.content or b"{}")
+        status, payload = standin.respond(request.url.path, body)
+        if isinstance(payload, list):
+            def stream():
+                for delay, line in payload:
+                    time.sleep(delay / 1000)
+                    yield line
+            return httpx.Response(status, content=stream(), headers={"content-type": "text/event-stream"})
+        time.sleep(standin.latency_ms(request.url.path, body) / 1000 if status == 200 else 0)
+        return _json_response(status, payload)
+    return httpx.MockTransport(handler)
+
+
+def async_transport(standin):
+    async def handler(request):
+        body = json.loads(request.content or b"{}")
+        status, payload = await asyncio.to_thread(standin.respond, request.url.path, body)
+        if isinstance(payload, list):
+            async def stream():
+                for delay, line in payload:
+                    await asyncio.sleep(delay / 1000)
+                    yield line
+            return httpx.Response(status, content=stream(), headers={"content-type": "text/event-stream"})
+        if status == 200:
+            await asyncio.sleep(standin.latency_ms(request.url.path, body) / 1000)
+        return _json_response(status, payload)
+    return httpx.MockTransport(handler)
+
+
+def client(standin):
+    from openai import OpenAI
+    return OpenAI(api_key="standin", base_url="http://standin/v1", http_client=httpx.Client(transport=sync_transport(standin)))
+
+
+def async_client(standin):
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key="standin", base_url="http://standin/v1",
+        http_client=httpx.AsyncClient(transport=async_transport(standin))
+    )
+
+
+class StandInEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the stand-in (no persistent embedding cache in front)."""
+
+    def __init__(self, standin, model_name="text-embedding-ada-002"):
+        self._client = client(standin)
+        self.model_name = model_name
+
+    def __call__(self, input):
+        response = self._client.embeddings.create(model=self.model_name, input=list(input))
+        return [np.asarray(item.embedding, dtype=np.float32) for item in response.data]
+
+
+def install(standin):
+    """Points Full_Prompt_new's OpenAI chat clients and OpenAI-embedded collections at the stand-in."""
+    import resources
+    import Full_Prompt_new
+    from embedding_backends import BACKENDS, get_collection
+
+    resources.register("openai_client", lambda: client(standin))
+    resources.reset("openai_client")
+    Full_Prompt_new.async_client_factory = lambda: async_client(standin)
+    Full_Prompt_new._async_clients.clear()
+
+    if Full_Prompt_new.EMBEDDING_BACKEND == "openai":
+        embedding_function = StandInEmbeddingFunction(standin, BACKENDS["openai"])
+        resources.register("recipes_collection", lambda: Full_Prompt_new.load_recipes_collection(embedding_function))
+        resources.register("ingredients_collection", lambda: get_collection(
+            resources.get("ingredients_client"), "fairprice_products_openai", "openai",
+            embedding_function=embedding_function
+        ))
+        resources.register("recipes_embedding_function", lambda: embedding_function)
+        for name in ("recipes_collection", "ingredients_collection", "recipes_embedding_function"):
+            resources.reset(name)
+    print(f"✅ OpenAI stand-in installed ({standin.mode} mode).")
+
+
+# --- HTTP server (base URL) ---
+
+def create_app(standin):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="OpenAI stand-in")
+
+    @app.post("/v1/{endpoint:path}")
+    async def handle(endpoint: str, request: Request):
+        body = await request.json()
+        path = f"/v1/{endpoint}"
+        status, payload = await asyncio.to_thread(standin.respond, path, body)
+        if isinstance(payload, list):
+            async def stream():
+                for delay, line in payload:
+                    await asyncio.sleep(delay / 1000)
+                    yield line
+            return StreamingResponse(stream(), media_type="text/event-stream")
+        if status == 200:
+            await asyncio.sleep(await asyncio.to_thread(standin.latency_ms, path, body) / 1000)
+        return JSONResponse(payload, status_code=status)
+
+    return app
+
+
+if __name__ == "__main__":
+    # Usage: python openai_standin.py [record|replay] [--port 8100]
+    import uvicorn
+    args = sys.argv[1:]
+    mode = next((a for a in args if not a.startswith("--") and not a.isdigit()), "replay")
+    port = int(args[args.index("--port") + 1]) if "--port" in args else 8100
+    print(f"🎞️ OpenAI stand-in ({mode}) on http://localhost:{port}/v1, cassettes in {CASSETTE_PATH}")
+    uvicorn.run(create_app(StandIn(mode)), host="127.0.0.1", port=port)
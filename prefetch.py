@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import Full_Prompt_new
+
+# --- Speculative Prefetch of Recipe Choices ---
+# While the user reads the choice table, the query-independent stages for each
+# displayed recipe (ingredient rows, product matches, link health) are prepared in
+# the background, so the chosen recipe starts straight at the LLM call.
+#
+# Policy:
+# - priority: recipes are prepared in display order (best-ranked first) on a small
+#   process-wide pool (RAGCIPE_PREFETCH_WORKERS, default 2), so sessions can't
+#   flood the backends;
+# - foreground first: a queued prefetch doesn't start while any foreground request
+#   (wrapped in `foreground()`) is running;
+# - cancellation: a new set of choices or a selection cancels every prefetch that
+#   hasn't started yet; one that is already running for the chosen recipe is waited
+#   for, as redoing the same work would take longer.
+
+PREFETCH_WORKERS = int(os.getenv("RAGCIPE_PREFETCH_WORKERS", "2"))
+PREFETCH_TTL = 10 * 60  # prepared link health goes stale after this many seconds
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="ragcipe-prefetch")
+_foreground_count = 0
+_foreground_idle = threading.Condition()
+
+
+@contextmanager
+def foreground():
+    """Marks a user-facing request; prefetches wait until no foreground request is running."""
+    global _foreground_count
+    with _foreground_idle:
+        _foreground_count += 1
+    try:
+        yield
+    finally:
+        with _foreground_idle:
+            _foreground_count -= 1
+            _foreground_idle.notify_all()
+
+
+def _wait_for_foreground():
+    with _foreground_idle:
+        _foreground_idle.wait_for(lambda: _foreground_count == 0)
+
+
+def recipe_key(recipe):
+    return recipe.get("id") or recipe["metadata"].get("url") or recipe["name"]
+
+
+class Prefetcher:
+    """Per-session cache of prepare_recipe results for the displayed recipe choices."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = {}     # key -> (future, submitted_at)
+        self._started = set()  # keys whose prefetch got past the foreground wait
+
+    def _prepare(self, key, recipe, generation):
+        _wait_for_foreground()
+        with self._lock:
+            if generation != self._generation:
+                return None  # cancelled while queued
+            self._started.add(key)
+        return Full_Prompt_new.prepare_recipe(recipe)
+
+    def _usable(self, key, now):
+        # Running past the foreground wait, or finished with a result that isn't stale yet
+        entry = self._entries.get(key)
+        if entry is None or now - entry[1] >= PREFETCH_TTL:
+            return False
+        future = entry[0]
+        if not future.done():
+            return key in self._started
+        return not future.cancelled() and future.exception() is None and future.result() is not None
+
+    def cancel(self):
+        """Cancels every prefetch that hasn't started yet."""
+        with self._lock:
+            self._generation += 1
+            for key, (future, _) in list(self._entries.items()):
+                if key not in self._started and future.cancel():
+                    del self._entries[key]
+
+    def start(self, recipe_choices):
+        """Starts prefetching the displayed choices, best-ranked first.
+
+        Prepared recipes don't depend on the query, so results from earlier choices are kept.
+        """
+        self.cancel()
+        now = time.time()
+        with self._lock:
+            generation = self._generation
+            for recipe in recipe_choices:
+                key = recipe_key(recipe)
+                if self._usable(key, now):
+                    continue
+                self._started.discard(key)
+                self._entries[key] = (_executor.submit(self._prepare, key, recipe, generation), now)
+
+    def take(self, recipe):
+        """Returns the prepared stages for the chosen recipe, or None to compute them in the foreground.
+
+        Cancels the remaining queued prefetches.
+        """
+        key = recipe_key(recipe)
+        self.cancel()
+        with self._lock:
+            if not self._usable(key, time.time()):
+                return None
+            future = self._entries[key][0]
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"⚠️ Prefetch for '{recipe['name']}' failed: {e}")
+            return None
@@ -0,0 +1,189 @@
+import os
+import re
+
+from tracing import set_attributes, traced
+
+# --- Token-Budgeted Compact Prompt ---
+# Builds the recipe prompt from de-duplicated sections, replaces every URL with a
+# short reference id ([L1], [L2], ...) that is expanded back in the answer, and
+# drops the least important sections until the prompt fits the token budget.
+#
+# Budget: RAGCIPE_PROMPT_TOKEN_BUDGET (default 2500 tokens).
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("RAGCIPE_PROMPT_TOKEN_BUDGET", "2500"))
+
+# Droppable sections, first dropped first. Everything else (instructions, the
+# query, recipe name and ingredients, cost table) is always kept.
+DROP_ORDER = [
+    "product_alternatives",  # 2nd/3rd product option per ingredient
+    "method",
+    "nutrition",
+    "products",              # remaining (best) product per ingredient
+]
+
+URL_RE = re.compile(r"https?://[^\s)\]>\"']+")
+REF_RE = re.compile(r"\[L(\d+)\]")
+
+_encoding = None
+
+
+def _get_encoding(model):
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # tiktoken missing or its encoding file can't be downloaded
+            print(f"⚠️ tiktoken unavailable ({e}); prompt token counts are approximate.")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text, model="gpt-4o"):
+    encoding = _get_encoding(model)
+    if encoding is False:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+class UrlRefs:
+    """Replaces URLs with [L<n>] reference ids and expands them again."""
+
+    def __init__(self):
+        self.urls = {}
+
+    def compact(self, text):
+        def ref(match):
+            url = match.group(0)
+            if url not in self.urls:
+                self.urls[url] = f"[L{len(self.urls) + 1}]"
+            return self.urls[url]
+        return URL_RE.sub(ref, text)
+
+    def expand(self, text):
+        by_ref = {ref: url for url, ref in self.urls.items()}
+        return REF_RE.sub(lambda m: by_ref.get(m.group(0), m.group(0)), text)
+
+    def _ready(self, pending):
+        # A reference id can be split across chunks, so text from an unclosed "[" is held back
+        cut = pending.rfind("[")
+        if cut == -1 or "]" in pending[cut:] or len(pending) - cut > 8:
+            cut = len(pending)
+        return self.expand(pending[:cut]), pending[cut:]
+
+    def expand_stream(self, chunks):
+        pending = ""
+        for chunk in chunks:
+            ready, pending = self._ready(pending + chunk)
+            if ready:
+                yield ready
+        if pending:
+            yield self.expand(pending)
+
+    async def expand_stream_async(self, chunks):
+        pending = ""
+        async for chunk in chunks:
+            ready, pending = self._ready(pending + chunk)
+            if ready:
+                yield ready
+        if pending:
+            yield self.expand(pending)
+
+
+def split_recipe_document(recipe_doc):
+    """Splits a Chroma recipe document into its Ingredients / Method / Nutritional Info sections."""
+    sections = {}
+    pattern = r"(Recipe Name|Ingredients|Method|Nutritional Info):"
+    parts = re.split(pattern, recipe_doc)
+    for label, body in zip(parts[1::2], parts[2::2]):
+        sections[label] = body.strip()
+    return sections
+
+
+PROMPT_HEADER = """You are an expert culinary assistant helping a user make an affordable, healthy purchase.
+
+User query: "{user_query}"
+
+Links are given as reference ids like [L1]. Whenever you cite a link, write the reference id exactly as given (e.g. "URL: [L1]"); it is replaced with the real URL afterwards.
+"""
+
+PROMPT_INSTRUCTIONS = """Respond in four sections:
+1. **Recipe Summary** – Summarize the key steps and ingredients in one concise paragraph, including the recipe URL.
+2. **Affordable Ingredient Recommendations** – For each necessary ingredient, pick up to three of the most relevant and cost-effective FairPrice products listed (based on price and quantity), with price, quantity and URL. Suggest substitutions where useful.
+3. **Nutritional Analysis** – Analyse the recipe's nutritional information: health benefits, dietary advantages (e.g. high protein, low saturated fat, rich in fibre) and who might benefit.
+"""
+
+
+def _product_lines(ingredients_from_db, url_status, max_options):
+    lines = []
+    for ing, products in ingredients_from_db.items():
+        options = []
+        for prod in products:
+            meta = prod['metadata']
+            product_url = meta.get('url', 'N/A')
+            if product_url != 'N/A' and not url_status.get(product_url, False):
+                continue
+            options.append(
+                f"  - {meta['name']} by {meta['brand']} | ${meta['price']} | {meta['size']} | {product_url}"
+            )
+        if options:
+            lines.append(f"- {ing}:")
+            lines += options[:max_options]
+    return "\n".join(lines)
+
+
+@traced("build_prompt")
+def build_compact_prompt(user_query, recipe_name, recipe_url, recipe_doc, ingredient_lines, nutritional_data,
+                         ingredients_from_db, url_status, cost_section, budget=PROMPT_TOKEN_BUDGET,
+                         model="gpt-4o"):
+    """Returns (prompt, refs, stats).
+
+    refs.expand / refs.expand_stream(_async) turn the answer's reference ids back into URLs;
+    stats has the prompt's token count, the budget and the dropped sections.
+    """
+    doc_sections = split_recipe_document(recipe_doc)
+    ingredients = "\n".join(f"- {line}" for line in ingredient_lines.values()) or doc_sections.get("Ingredients", "")
+
+    sections = {
+        "header": PROMPT_HEADER.format(user_query=user_query),
+        "recipe": f"**Recipe:** {recipe_name} ({recipe_url})\n**Ingredients:**\n{ingredients}\n",
+        "method": f"**Method:**\n{doc_sections['Method']}\n" if doc_sections.get("Method") else "",
+        "nutrition": f"**Nutritional Information:**\n{nutritional_data}\n",
+        "products": "",
+        "instructions": PROMPT_INSTRUCTIONS,
+        "cost": cost_section,
+    }
+    all_products = _product_lines(ingredients_from_db, url_status, max_options=3)
+    best_products = _product_lines(ingredients_from_db, url_status, max_options=1)
+
+    dropped = []
+
+    def render():
+        products = best_products if "product_alternatives" in dropped else all_products
+        if "products" in dropped:
+            products = ""
+        sections["products"] = f"**FairPrice Products** (name by brand | price | size | URL):\n{products}\n" if products else ""
+        parts = [
+            sections[name] for name in ("header", "recipe", "method", "nutrition", "products", "instructions", "cost")
+            if name not in dropped and sections[name]
+        ]
+        refs = UrlRefs()
+        prompt = refs.compact("\n".join(parts))
+        return prompt, refs, count_tokens(prompt, model)
+
+    prompt, refs, tokens = render()
+    for name in DROP_ORDER:
+        if tokens <= budget:
+            break
+        dropped.append(name)
+        prompt, refs, tokens = render()
+
+    stats = {"prompt_tokens": tokens, "budget": budget, "dropped": dropped, "links": len(refs.urls)}
+    set_attributes(**stats)
+    over = " (over budget)" if tokens > budget else ""
+    print(f"📏 Prompt: {tokens} tokens / budget {budget}{over}; "
+          f"dropped: {', '.join(dropped) or 'none'}; {len(refs.urls)} links shortened.")
+    return prompt, refs, stats
@@ -0,0 +1,58 @@
+import threading
+
+# --- Lazy Resource Registry ---
+# Heavy dependencies (models, clients, collections) are registered with a factory
+# and built on first use, exactly once per process, even under concurrent access.
+
+_factories = {}
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, factory):
+    """Registers a zero-argument factory for a lazily created resource."""
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    """Returns the resource, creating it on first call."""
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    if name not in _factories:
+        raise KeyError(f"No resource registered under '{name}'")
+    with _locks[name]:
+        # Another thread may have built it while we waited for the lock
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+    return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def reset(name=None):
+    """Drops one (or every) built instance so the next get() rebuilds it."""
+    with _registry_lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def warm_up_in_background(warm_up, name="resource-warm-up"):
+    """Runs a warm-up callable on a daemon thread and returns the thread."""
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"⚠️ Warm-up failed: {e}")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
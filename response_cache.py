@@ -0,0 +1,94 @@
+import sqlite3
+import hashlib
+import json
+import re
+import threading
+import time
+
+# --- Settings ---
+CACHE_PATH = "response_cache.db"
+MAX_ENTRIES = 2_000
+TTL = 24 * 3600
+
+
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.strip("?!. ")
+
+
+def cache_key(recipe_id, query, template_version, model):
+    raw = f"{recipe_id}\x00{normalize_query(query)}\x00{template_version}\x00{model}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Persistent LRU + TTL cache for generated recipe responses."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                recipe_id TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_recipe ON responses(recipe_id)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at >= self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(response)
+
+    def put(self, key, recipe_id, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, recipe_id, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, str(recipe_id), json.dumps(response), now, now)
+            )
+            # Drop expired entries, then least recently used ones beyond the bound
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def invalidate(self, recipe_id=None):
+        """Drops cached responses for one recipe, or all of them when recipe_id is None."""
+        with self._lock:
+            if recipe_id is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE recipe_id = ?", (str(recipe_id),))
+            self._conn.commit()
+
+
+def invalidate_responses(recipe_id=None, path=CACHE_PATH):
+    """Invalidation hook, e.g. after product prices or links are refreshed."""
+    ResponseCache(path).invalidate(recipe_id)
@@ -0,0 +1,222 @@
+import sys
+try:
+    import pysqlite3  # This is the pip-installed "pysqlite3-binary" package
+    # Re-map the built-in "sqlite3" to "pysqlite3"
+    sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+except ImportError:
+    pass  # if pysqlite3 isn't found, fallback to system sqlite3
+
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from chromadb.api.types import EmbeddingFunction
+
+# --- Offline Retrieval Benchmark ---
+# Replays the evaluation prompts through get_recipe_choices with pre-recorded query
+# embeddings (no OpenAI calls) and reports Top-k accuracy, MRR and per-stage latency
+# percentiles as JSON, so configurations can be compared run over run.
+#
+# Record the query embeddings once (needs the embedding backend):
+#     python retrieval_benchmark.py record
+# Run (offline):
+#     python retrieval_benchmark.py run [--rerank-pool 8] [--vector-k 10] [--lexical-k 10]
+#                                       [--repeat 3] [--no-score-cache] [--out results.json]
+# The embedding backend follows RAGCIPE_EMBEDDING_BACKEND; the reranker RAGCIPE_RERANKER_BACKEND.
+
+EVAL_PATH = "Evaluation_Recipes/Evaluation_Dataset_Recipes.csv"
+TOP_KS = (1, 3, 5)
+
+
+def embeddings_path(backend):
+    return f"Evaluation_Recipes/query_embeddings_{backend}.npz"
+
+
+def load_eval_set(path=EVAL_PATH):
+    # Ground truth is matched by recipe name: the CSV's ids are recipes_clean ids,
+    # which are numbered differently from the recipes_collection ids
+    eval_df = pd.read_csv(path)
+    eval_df = eval_df[eval_df["ground_truth_names"].notna() & (eval_df["ground_truth_names"] != "")]
+    return [
+        (row["prompt"], {name.strip().lower() for name in row["ground_truth_names"].split(";") if name.strip()})
+        for _, row in eval_df.iterrows()
+    ]
+
+
+def record_embeddings(backend):
+    from embedding_backends import get_embedding_function
+    prompts = [prompt for prompt, _ in load_eval_set()]
+    vectors = get_embedding_function(backend)(prompts)
+    np.savez_compressed(embeddings_path(backend), prompts=np.array(prompts), embeddings=np.array(vectors))
+    print(f"✅ Recorded {len(prompts)} query embeddings to {embeddings_path(backend)}.")
+
+
+class ReplayEmbeddingFunction(EmbeddingFunction):
+    """Serves pre-recorded query embeddings; unknown texts are an error rather than an API call."""
+
+    def __init__(self, path, timer=None):
+        data = np.load(path)
+        self.vectors = {str(prompt): vector for prompt, vector in zip(data["prompts"], data["embeddings"])}
+        self.timer = timer
+
+    def __call__(self, input):
+        started = time.perf_counter()
+        missing = [text for text in input if text not in self.vectors]
+        if missing:
+            raise KeyError(f"No recorded embedding for {missing[:3]}; re-run `record`.")
+        vectors = [self.vectors[text] for text in input]
+        if self.timer is not None:
+            self.timer.record("embedding", (time.perf_counter() - started) * 1000)
+        return vectors
+
+
+class StageTimer:
+    """Collects wall-clock milliseconds per pipeline stage for the query being replayed."""
+
+    def __init__(self):
+        self.current = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, ms):
+        with self._lock:
+            self.current[stage] = self.current.get(stage, 0.0) + ms
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, (time.perf_counter() - started) * 1000)
+        return timed
+
+    def take(self):
+        with self._lock:
+            timings, self.current = self.current, {}
+        return timings
+
+
+class TimedCollection:
+    # vector_search includes the (replayed) query embedding, which Chroma computes inside query()
+    def __init__(self, collection, timer):
+        self._collection = collection
+        self.query = timer.wrap("vector_search", collection.query)
+        self.get = timer.wrap("vector_fetch", collection.get)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def instrument(Full_Prompt_new, replay_ef, timer):
+    """Points the pipeline at the replayed embeddings and times each stage."""
+    import chromadb
+    import resources
+
+    def replay_collection():
+        return TimedCollection(Full_Prompt_new.load_recipes_collection(replay_ef), timer)
+
+    resources.register("recipes_client", lambda: chromadb.PersistentClient(path="chroma_db"))
+    resources.register("recipes_collection", replay_collection)
+    resources.register("recipes_embedding_function", lambda: replay_ef)
+    resources.reset("recipes_collection")
+    resources.reset("recipes_embedding_function")
+
+    Full_Prompt_new.nutrition_prefilter = timer.wrap("prefilter", Full_Prompt_new.nutrition_prefilter)
+    Full_Prompt_new.search_recipes_fts = timer.wrap("lexical_search", Full_Prompt_new.search_recipes_fts)
+    Full_Prompt_new.fuse_candidates = timer.wrap("fusion", Full_Prompt_new.fuse_candidates)
+    Full_Prompt_new.rerank = timer.wrap("rerank", Full_Prompt_new.rerank)
+
+
+def percentiles(values):
+    values = np.array(values)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2),
+    }
+
+
+def run_benchmark(args):
+    # Retrieval depth is read from the environment when Full_Prompt_new is imported
+    os.environ["RAGCIPE_RERANK_POOL"] = str(args.rerank_pool)
+    os.environ["RAGCIPE_VECTOR_K"] = str(args.vector_k)
+    os.environ["RAGCIPE_LEXICAL_K"] = str(args.lexical_k)
+    import Full_Prompt_new
+    from score_cache import ScoreCache
+
+    timer = StageTimer()
+    replay_ef = ReplayEmbeddingFunction(embeddings_path(Full_Prompt_new.EMBEDDING_BACKEND), timer)
+    instrument(Full_Prompt_new, replay_ef, timer)
+    if args.no_score_cache:
+        Full_Prompt_new.score_cache = ScoreCache(max_entries=0)
+    Full_Prompt_new.get_cross_encoder()  # model load is not part of any query's latency
+
+    eval_set = load_eval_set()
+    stage_ms = {}
+    hits = {k: 0 for k in TOP_KS}
+    reciprocal_ranks = []
+    per_query = []
+    for repeat in range(args.repeat):
+        for prompt, expected in eval_set:
+            started = time.perf_counter()
+            choices = Full_Prompt_new.get_recipe_choices(prompt, n_results=max(TOP_KS))
+            total = (time.perf_counter() - started) * 1000
+            timings = {**timer.take(), "total": total}
+            for stage, ms in timings.items():
+                stage_ms.setdefault(stage, []).append(ms)
+            if repeat > 0:
+                continue  # accuracy doesn't change between repeats
+
+            names = [choice["name"].strip().lower() for choice in choices]
+            rank = next((i + 1 for i, name in enumerate(names) if name in expected), None)
+            for k in TOP_KS:
+                hits[k] += rank is not None and rank <= k
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            per_query.append({"prompt": prompt, "rank": rank, "retrieved": [c["name"] for c in choices]})
+
+    n = len(eval_set)
+    return {
+        "config": {
+            "embedding_backend": Full_Prompt_new.EMBEDDING_BACKEND,
+            "reranker_backend": Full_Prompt_new.RERANKER_BACKEND,
+            "vector_k": Full_Prompt_new.VECTOR_K,
+            "lexical_k": Full_Prompt_new.LEXICAL_K,
+            "rerank_pool": Full_Prompt_new.RERANK_POOL,
+            "score_cache": not args.no_score_cache,
+            "repeat": args.repeat,
+        },
+        "queries": n,
+        "metrics": {
+            **{f"top_{k}": round(hits[k] / n, 4) for k in TOP_KS},
+            "mrr": round(sum(reciprocal_ranks) / n, 4),
+        },
+        "latency_ms": {stage: percentiles(values) for stage, values in stage_ms.items()},
+        "per_query": per_query,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    parser.add_argument("command", choices=["record", "run"])
+    parser.add_argument("--rerank-pool", type=int, default=int(os.getenv("RAGCIPE_RERANK_POOL", "8")))
+    parser.add_argument("--vector-k", type=int, default=int(os.getenv("RAGCIPE_VECTOR_K", "10")))
+    parser.add_argument("--lexical-k", type=int, default=int(os.getenv("RAGCIPE_LEXICAL_K", "10")))
+    parser.add_argument("--repeat", type=int, default=1, help="replays per prompt for latency percentiles")
+    parser.add_argument("--no-score-cache", action="store_true", help="score every (query, recipe) pair")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from embedding_backends import DEFAULT_BACKEND
+        record_embeddings(DEFAULT_BACKEND)
+    else:
+        results = run_benchmark(args)
+        output = json.dumps(results, indent=2)
+        print(output)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(output)
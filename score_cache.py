@@ -0,0 +1,84 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import tracing
+
+MAX_ENTRIES = 50_000
+# Pairs per cross-encoder forward pass
+BATCH_SIZE = int(os.getenv("RAGCIPE_RERANK_BATCH_SIZE", "32"))
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query.lower()).strip()
+
+
+class ScoreCache:
+    """Bounded in-memory LRU of cross-encoder scores keyed by (normalized query, recipe id, model id)."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._scores),
+        }
+
+    def predict(self, model, model_id, query, documents, doc_ids=None, batch_size=BATCH_SIZE):
+        """Scores (query, doc) pairs, sending only uncached pairs to model.predict in one batch."""
+        return self.predict_many(model, model_id, [(query, documents, doc_ids)], batch_size)[0]
+
+    def predict_many(self, model, model_id, requests, batch_size=BATCH_SIZE):
+        """Scores several (query, documents, doc_ids) requests; the uncached pairs of all of
+        them are flattened into a single model.predict call. Returns one score list per request.
+        """
+        keys = []
+        for query, documents, doc_ids in requests:
+            if doc_ids is None:
+                doc_ids = [None] * len(documents)
+            query_key = normalize_query(query)
+            keys.append([
+                (query_key, str(doc_id) if doc_id is not None else hashlib.sha1(doc.encode("utf-8")).hexdigest(), model_id)
+                for doc, doc_id in zip(documents, doc_ids)
+            ])
+
+        scores = [[None] * len(documents) for _, documents, _ in requests]
+        missing = []  # (request index, document index)
+        with self._lock:
+            for r, request_keys in enumerate(keys):
+                for i, key in enumerate(request_keys):
+                    if key in self._scores:
+                        self._scores.move_to_end(key)
+                        scores[r][i] = self._scores[key]
+                    else:
+                        missing.append((r, i))
+            total = sum(len(request_keys) for request_keys in keys)
+            self.hits += total - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # The same (query, doc) pair is only scored once per call
+            pairs = {}
+            for r, i in missing:
+                pairs.setdefault(keys[r][i], (requests[r][0], requests[r][1][i]))
+            with tracing.span("cross_encoder", pairs=len(pairs), cache_hits=total - len(missing)):
+                new_scores = dict(zip(pairs, model.predict(list(pairs.values()), batch_size=batch_size)))
+            with self._lock:
+                for key, score in new_scores.items():
+                    self._scores[key] = float(score)
+                    self._scores.move_to_end(key)
+                for r, i in missing:
+                    scores[r][i] = float(new_scores[keys[r][i]])
+                while len(self._scores) > self.max_entries:
+                    self._scores.popitem(last=False)
+        return scores
@@ -0,0 +1,242 @@
+import functools
+import inspect
+import json
+import os
+import sys
+from datetime import datetime
+
+# --- Pipeline Tracing (OpenTelemetry) ---
+# Spans around the pipeline stages (retrieval, reranking, ingredient search, link
+# checks, prompt building, LLM calls) so a slow request shows where its time went.
+#
+# Off by default. When off, `traced` returns the function unchanged and `span` hands
+# out a shared no-op span, so the instrumented code pays only for a flag check.
+#
+#   RAGCIPE_TRACING=1                 enable
+#   RAGCIPE_TRACE_EXPORTER=file       one JSON span per line in RAGCIPE_TRACE_FILE (default)
+#                         console     print spans to stdout
+#                         otlp        send to a collector (OTEL_EXPORTER_OTLP_ENDPOINT)
+#
+# Summarize a trace file:  python tracing.py [traces.jsonl]
+
+ENABLED = os.getenv("RAGCIPE_TRACING", "0") == "1"
+EXPORTER = os.getenv("RAGCIPE_TRACE_EXPORTER", "file")
+TRACE_FILE = os.getenv("RAGCIPE_TRACE_FILE", "traces.jsonl")
+SERVICE_NAME = "ragcipe"
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_tracer = None
+
+
+def _setup():
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        exporter = ConsoleSpanExporter(
+            out=open(TRACE_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    # Spans are exported from a background thread; the provider flushes them at exit
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    print(f"🔭 Tracing enabled ({EXPORTER}{': ' + TRACE_FILE if EXPORTER == 'file' else ''}).")
+    return trace.get_tracer(SERVICE_NAME)
+
+
+if ENABLED:
+    try:
+        _tracer = _setup()
+    except ImportError as e:
+        print(f"⚠️ RAGCIPE_TRACING=1 but OpenTelemetry is unavailable ({e}); tracing disabled.")
+        ENABLED = False
+
+
+def _clean(attributes):
+    # OpenTelemetry only accepts primitive (or list-of-primitive) values
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+def span(name, **attributes):
+    """Context manager for a child span of the current one: `with span("rerank", candidates=8) as s:`."""
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start_as_current_span(name, attributes=_clean(attributes))
+
+
+def start_span(name, **attributes):
+    """A span that is not made current; for generators, which are resumed in other contexts.
+    The caller must call .end()."""
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start_span(name, attributes=_clean(attributes))
+
+
+def set_attributes(**attributes):
+    """Adds attributes to the current span (e.g. one opened by @traced)."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def traced(name=None):
+    """Decorator wrapping each call of a (sync or async) function in a span."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def propagate(func):
+    """Runs func under the caller's trace context, so spans it opens in a thread pool
+    (ThreadPoolExecutor doesn't copy context; asyncio.to_thread does) stay in the same trace."""
+    if not ENABLED:
+        return func
+    from opentelemetry import context
+    ctx = context.get_current()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = context.attach(ctx)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            context.detach(token)
+    return wrapper
+
+
+def in_context(coro):
+    """propagate for a coroutine handed to another event loop (run_coroutine_threadsafe)."""
+    if not ENABLED:
+        return coro
+    from opentelemetry import context
+    ctx = context.get_current()
+
+    async def run():
+        token = context.attach(ctx)
+        try:
+            return await coro
+        finally:
+            context.detach(token)
+    return run()
+
+
+def traced_stream(chunks, name, **attributes):
+    """Wraps a chunk iterator in a span from the first pull to exhaustion, with a
+    `first_chunk` event (time to first token) and the chunk count."""
+    if not ENABLED:
+        return chunks
+    stream_span = start_span(name, **attributes)
+
+    def wrapped():
+        count = 0
+        try:
+            for chunk in chunks:
+                if count == 0:
+                    stream_span.add_event("first_chunk")
+                count += 1
+                yield chunk
+        finally:
+            stream_span.set_attribute("chunks", count)
+            stream_span.end()
+    return wrapped()
+
+
+def traced_stream_async(chunks, name, **attributes):
+    """traced_stream for async iterators."""
+    if not ENABLED:
+        return chunks
+    stream_span = start_span(name, **attributes)
+
+    async def wrapped():
+        count = 0
+        try:
+            async for chunk in chunks:
+                if count == 0:
+                    stream_span.add_event("first_chunk")
+                count += 1
+                yield chunk
+        finally:
+            stream_span.set_attribute("chunks", count)
+            stream_span.end()
+    return wrapped()
+
+
+def instrument_fastapi(app):
+    """Adds a server span per HTTP request, parent of the pipeline spans."""
+    if not ENABLED:
+        return
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app)
+
+
+# --- Trace File Summary ---
+
+def _duration_ms(record):
+    start = datetime.fromisoformat(record["start_time"])
+    end = datetime.fromisoformat(record["end_time"])
+    return (end - start).total_seconds() * 1000
+
+
+def summarize(path=TRACE_FILE):
+    """Per-span-name count and p50 / p95 / max milliseconds from a file-exporter trace."""
+    durations = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                durations.setdefault(record["name"], []).append(_duration_ms(record))
+
+    print(f"{'span':<36}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        p50 = values[len(values) // 2]
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{name:<36}{len(values):>7}{p50:>10.1f}{p95:>10.1f}{values[-1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE)
@@ -0,0 +1,121 @@
+import sqlite3
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+# --- Settings ---
+CACHE_PATH = "url_cache.db"
+VALID_TTL = 7 * 24 * 3600   # re-check live links after a week
+INVALID_TTL = 6 * 3600      # dead links expire sooner in case they come back
+MAX_WORKERS = 16
+TIMEOUT = 5
+
+# --- Pooled HTTP session shared by all worker threads ---
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect():
+    global _initialized
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    if not _initialized:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_status (
+                    url TEXT PRIMARY KEY,
+                    valid INTEGER NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            _initialized = True
+    return conn
+
+
+def _is_fresh(valid, checked_at, now):
+    ttl = VALID_TTL if valid else INVALID_TTL
+    return now - checked_at < ttl
+
+
+def get_cached(urls):
+    """Returns {url: bool} for every URL with a fresh entry in the on-disk cache."""
+    urls = list(urls)
+    if not urls:
+        return {}
+    now = time.time()
+    cached = {}
+    conn = _connect()
+    try:
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT url, valid, checked_at FROM url_status WHERE url IN ({placeholders})",
+                chunk
+            ).fetchall()
+            for url, valid, checked_at in rows:
+                if _is_fresh(valid, checked_at, now):
+                    cached[url] = bool(valid)
+    finally:
+        conn.close()
+    return cached
+
+
+def store_results(results):
+    """Writes {url: bool} check results to the on-disk cache."""
+    if not results:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.executemany(
+            "INSERT OR REPLACE INTO url_status (url, valid, checked_at) VALUES (?, ?, ?)",
+            [(url, int(valid), now) for url, valid in results.items()]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_url(url: str) -> bool:
+    """Live HEAD check, bypassing the cache."""
+    with tracing.span("check_url", url=url) as span:
+        try:
+            response = _session.head(url, allow_redirects=True, timeout=TIMEOUT)
+            span.set_attribute("status_code", response.status_code)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+
+def validate_urls(urls):
+    """Checks all URLs concurrently, serving fresh results from the cache.
+
+    Returns a dict mapping each URL to True (reachable) or False.
+    """
+    unique_urls = list(dict.fromkeys(u for u in urls if u and u != 'N/A'))
+    with tracing.span("validate_urls", urls=len(unique_urls)) as span:
+        results = get_cached(unique_urls)
+        misses = [u for u in unique_urls if u not in results]
+        span.set_attribute("live_checks", len(misses))
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(misses))) as executor:
+                checked = dict(zip(misses, executor.map(tracing.propagate(check_url), misses)))
+            store_results(checked)
+            results.update(checked)
+    return results
+
+
+def is_valid_url(url: str) -> bool:
+    return validate_urls([url]).get(url, False)